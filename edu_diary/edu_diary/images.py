@@ -0,0 +1,299 @@
+"""
+Уменьшенные копии загруженных изображений: размеры thumb, card и full в WebP и JPEG.
+
+VariantImageField ещё до записи в хранилище убирает из загрузки метаданные (EXIF,
+в том числе координаты съёмки), сохраняет её под именем из хэша содержимого и после
+коммита транзакции передаёт файл фоновому обработчику. Обработчик пишет рядом варианты
+<имя>_<размер>.<формат> и отмечает готовность в булевом поле модели (variants_field),
+по которому ImageVariantsField отдаёт их адреса в API, не обращаясь к хранилищу.
+
+Под одним именем всегда лежит одно и то же содержимое, поэтому варианты можно кэшировать
+бессрочно. Заголовок Cache-Control для них ставит serve_media только в разработке (DEBUG);
+в работе медиафайлы раздаёт веб-сервер, и заголовок задаётся в его настройках (см. README).
+"""
+import hashlib
+import io
+import logging
+import posixpath
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, models, transaction
+from django.db.models.fields.files import ImageFieldFile
+from django.db.models.signals import post_save
+from django.dispatch import Signal
+from django.views.static import serve
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema_field
+from PIL import Image, ImageOps
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+# Наибольшая сторона варианта в пикселях; меньшие изображения не увеличиваются
+VARIANT_SIZES = {'thumb': 160, 'card': 640, 'full': 1600}
+VARIANT_FORMATS = {'webp': 'WEBP', 'jpg': 'JPEG'}
+VARIANT_QUALITY = 80
+VARIANT_RE = re.compile(r'_(%s)\.(%s)$' % ('|'.join(VARIANT_SIZES), '|'.join(VARIANT_FORMATS)))
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Ключи Image.info, в которых Pillow отдаёт метаданные: EXIF, XMP, блоки Photoshop, комментарии
+METADATA_KEYS = ('exif', 'xmp', 'XML:com.adobe.xmp', 'photoshop', 'comment')
+# Форматы, в которых оригинал пересохраняется как есть; остальные — в PNG
+STRIPPED_FORMATS = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp'}
+
+# Отправляется, когда варианты изображения записаны: sender — модель, name — имя оригинала
+variants_ready = Signal()
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def variant_name(name, size, fmt):
+    root, _ = posixpath.splitext(name)
+    return f'{root}_{size}.{fmt}'
+
+
+def _encode(image, fmt, **options):
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, **options)
+    return buffer.getvalue()
+
+
+def _replace(storage, name, data):
+    if storage.exists(name):
+        storage.delete(name)
+    storage.save(name, ContentFile(data))
+
+
+def _has_metadata(image):
+    return (
+        bool(image.getexif())
+        or any(key in image.info for key in METADATA_KEYS)
+        or bool(getattr(image, 'text', None))
+    )
+
+
+def strip_metadata(content):
+    """
+    Изображение без метаданных: (ContentFile, расширение) или None, если убирать нечего
+    или это не изображение (его отклонит проверка ImageField). Поворот из EXIF
+    применяется к пикселям, ICC-профиль сохраняется, чтобы не исказить цвета.
+    """
+    try:
+        content.seek(0)
+        image = Image.open(content)
+        if not _has_metadata(image):
+            return None
+        original_format = image.format
+        animated = getattr(image, 'is_animated', False)
+        if not animated:
+            image = ImageOps.exif_transpose(image)
+    except (OSError, ValueError, SyntaxError):
+        return None
+    finally:
+        content.seek(0)
+
+    image_format = original_format if original_format in STRIPPED_FORMATS else 'PNG'
+    if image_format == 'PNG' and image.mode not in ('1', 'L', 'LA', 'I', 'P', 'RGB', 'RGBA'):
+        image = image.convert('RGB')
+    options = {'quality': 90} if image_format != 'PNG' else {}
+    if animated:
+        options['save_all'] = True
+    if image.info.get('icc_profile'):
+        options['icc_profile'] = image.info['icc_profile']
+    # Без параметров exif/xmp Pillow метаданные не записывает
+    return ContentFile(_encode(image, image_format, **options)), STRIPPED_FORMATS[image_format]
+
+
+def strip_stored_metadata(storage, name):
+    """Убирает метаданные из уже сохранённого файла, если его формат сохраняется под тем же именем."""
+    with storage.open(name, 'rb') as source:
+        stripped = strip_metadata(ContentFile(source.read()))
+    if stripped is None:
+        return False
+    content, extension = stripped
+    if extension != posixpath.splitext(name)[1].lower():
+        return False
+    _replace(storage, name, content.read())
+    return True
+
+
+def generate_variants(storage, name):
+    """Пишет варианты изображения name; метаданные из оригинала убраны ещё при загрузке."""
+    with storage.open(name, 'rb') as source:
+        image = Image.open(source)
+        # JPEG декодируется сразу в уменьшенном масштабе, не больше наибольшего варианта
+        largest = max(VARIANT_SIZES.values())
+        image.draft('RGB', (largest, largest))
+        image = ImageOps.exif_transpose(image)
+
+    has_alpha = image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info)
+    image = image.convert('RGBA' if has_alpha else 'RGB')
+
+    # Каждый вариант уменьшается из предыдущего, большего — так быстрее, чем каждый раз из оригинала
+    resized = {}
+    for size, side in sorted(VARIANT_SIZES.items(), key=lambda item: -item[1]):
+        image = image.copy()
+        image.thumbnail((side, side), Image.LANCZOS)
+        resized[size] = image
+
+    for size in VARIANT_SIZES:
+        for fmt, pil_format in VARIANT_FORMATS.items():
+            variant = resized[size]
+            if pil_format == 'JPEG' and variant.mode == 'RGBA':
+                background = Image.new('RGB', variant.size, 'white')
+                background.paste(variant, mask=variant.getchannel('A'))
+                variant = background
+            data = _encode(variant, pil_format, quality=VARIANT_QUALITY, optimize=pil_format == 'JPEG')
+            _replace(storage, variant_name(name, size, fmt), data)
+
+
+def process_image(model, field_name, name):
+    """Готовит варианты файла name из поля field_name и отмечает их готовность у всех строк с этим файлом."""
+    field = model._meta.get_field(field_name)
+    try:
+        generate_variants(field.storage, name)
+    except Exception:
+        logger.exception('Не удалось подготовить варианты изображения %s', name)
+        return
+    if field.variants_field:
+        model._default_manager.filter(**{field_name: name}).update(**{field.variants_field: True})
+    variants_ready.send(sender=model, name=name)
+
+
+def _process_in_worker(model, field_name, name):
+    # Соединение с базой у потока обработчика своё, закрываем его как после запроса
+    close_old_connections()
+    try:
+        process_image(model, field_name, name)
+    finally:
+        close_old_connections()
+
+
+def enqueue_variants(model, field_name, name):
+    """
+    Ставит изображение в очередь обработки. При IMAGE_VARIANT_WORKERS = 0 обработка
+    идёт в текущем потоке (так удобнее в тестах).
+    """
+    global _executor
+    workers = getattr(settings, 'IMAGE_VARIANT_WORKERS', 2)
+    if not workers:
+        process_image(model, field_name, name)
+        return
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image-variants')
+    _executor.submit(_process_in_worker, model, field_name, name)
+
+
+class VariantImageFieldFile(ImageFieldFile):
+    def save(self, name, content, save=True):
+        # Метаданные убираются до записи: оригинал доступен по MEDIA_URL сразу после сохранения
+        stripped = strip_metadata(content)
+        if stripped is not None:
+            content, extension = stripped
+        else:
+            extension = posixpath.splitext(name)[1].lower()
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        # Новое содержимое — новое имя, так что устаревшие копии из кэшей браузеров не показываются
+        basename = f'{digest.hexdigest()[:32]}{extension}'
+        name = self.field.generate_filename(self.instance, basename)
+        if self.storage.exists(name):
+            # То же содержимое уже сохранено: берём готовый файл вместо копии под новым именем
+            self.name = name
+            setattr(self.instance, self.field.attname, self.name)
+            self._committed = True
+        else:
+            super().save(basename, content, save=False)
+        if self.field.variants_ready_for(self.instance, self.name):
+            setattr(self.instance, self.field.variants_field, True)
+        else:
+            # FieldFile.save заменяет файл в атрибуте модели, поэтому отметка хранится на самом объекте
+            setattr(self.instance, self.field.pending_attname, True)
+        if save:
+            self.instance.save()
+
+
+class VariantImageField(models.ImageField):
+    """
+    ImageField, который хранит файлы под хэшем содержимого и готовит их варианты.
+    variants_field — имя BooleanField модели, где отмечается готовность вариантов
+    (по аналогии с width_field/height_field у ImageField).
+    """
+    attr_class = VariantImageFieldFile
+
+    def __init__(self, *args, variants_field=None, **kwargs):
+        self.variants_field = variants_field
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.variants_field:
+            kwargs['variants_field'] = self.variants_field
+        return name, path, args, kwargs
+
+    @property
+    def pending_attname(self):
+        return f'_{self.attname}_needs_variants'
+
+    def variants_ready_for(self, instance, name):
+        """Готовы ли варианты файла name: его уже обработали для другой строки этой модели."""
+        if not self.variants_field:
+            return False
+        return type(instance)._default_manager.filter(**{self.attname: name, self.variants_field: True}).exists()
+
+    def contribute_to_class(self, cls, name, **kwargs):
+        super().contribute_to_class(cls, name, **kwargs)
+        if not cls._meta.abstract:
+            post_save.connect(self.schedule_variants, sender=cls)
+
+    def schedule_variants(self, instance, **kwargs):
+        if not instance.__dict__.pop(self.pending_attname, False):
+            return
+        model, field_name, name = type(instance), self.name, getattr(instance, self.attname).name
+        if self.variants_field:
+            # Новому файлу варианты ещё только предстоит подготовить
+            setattr(instance, self.variants_field, False)
+            model._default_manager.filter(pk=instance.pk).update(**{self.variants_field: False})
+        transaction.on_commit(lambda: enqueue_variants(model, field_name, name), using=kwargs.get('using'))
+
+
+@extend_schema_field(OpenApiTypes.OBJECT)
+class ImageVariantsField(serializers.Field):
+    """
+    Адреса вариантов изображения: {"thumb": {"webp": url, "jpg": url}, "card": ..., "full": ...}.
+    null, если изображения нет или варианты ещё не готовы — тогда клиент берёт оригинал.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        variants_field = getattr(value.field, 'variants_field', None)
+        if not value or not variants_field or not getattr(value.instance, variants_field):
+            return None
+        request = self.context.get('request')
+        urls = {}
+        for size in VARIANT_SIZES:
+            urls[size] = {}
+            for fmt in VARIANT_FORMATS:
+                url = value.storage.url(variant_name(value.name, size, fmt))
+                urls[size][fmt] = request.build_absolute_uri(url) if request is not None else url
+        return urls
+
+
+def serve_media(request, path, document_root=None, show_indexes=False):
+    """
+    Раздача медиа в разработке (DEBUG); варианты изображений отдаются с бессрочным
+    кэшированием. В работе тот же заголовок должен ставить веб-сервер.
+    """
+    response = serve(request, path, document_root=document_root, show_indexes=show_indexes)
+    if VARIANT_RE.search(path):
+        response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
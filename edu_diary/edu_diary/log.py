@@ -0,0 +1,49 @@
+"""
+Структурированное логирование: идентификатор запроса в каждой записи и выборочный DEBUG.
+
+RequestIdMiddleware задаёт идентификатор запроса (из заголовка X-Request-ID или новый)
+и решает, попадёт ли запрос в выборку отладочных логов. Фильтры подключаются
+к обработчикам в settings.LOGGING.
+"""
+import logging
+import random
+import uuid
+from contextvars import ContextVar
+
+from django.conf import settings
+
+request_id_var = ContextVar('request_id', default='-')
+debug_sampled_var = ContextVar('debug_sampled', default=True)
+
+
+class RequestIdMiddleware:
+    header = 'HTTP_X_REQUEST_ID'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_id = request.META.get(self.header) or uuid.uuid4().hex
+        sample_rate = getattr(settings, 'LOG_DEBUG_SAMPLE_RATE', 1.0)
+        request_token = request_id_var.set(request_id[:64])
+        sampled_token = debug_sampled_var.set(random.random() < sample_rate)
+        try:
+            response = self.get_response(request)
+        finally:
+            request_id_var.reset(request_token)
+            debug_sampled_var.reset(sampled_token)
+        response['X-Request-ID'] = request_id[:64]
+        return response
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+class DebugSamplingFilter(logging.Filter):
+    """Пропускает DEBUG-записи только для запросов, попавших в выборку; остальные уровни — всегда."""
+
+    def filter(self, record):
+        return record.levelno > logging.DEBUG or debug_sampled_var.get()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 import os
+import tempfile
 from dotenv import load_dotenv
 from pathlib import Path
 
@@ -36,6 +37,8 @@ ALLOWED_HOSTS = ['*']
 # Application definition
 
 INSTALLED_APPS = [
+    # daphne переопределяет runserver, чтобы в разработке работали и WebSocket
+    'daphne',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -55,6 +58,7 @@ AUTH_USER_MODEL = 'users.User'
 
 
 MIDDLEWARE = [
+    'edu_diary.log.RequestIdMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -82,19 +86,142 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'edu_diary.wsgi.application'
+ASGI_APPLICATION = 'edu_diary.asgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
+# DB_ENGINE=postgres — продакшн-профиль, DB_ENGINE=sqlite (по умолчанию) — для небольших
+# установок и разработки. Сравнение профилей: python manage.py benchmark_grade_writes.
+
+DB_ENGINE = os.getenv('DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgres':
+    # Пул соединений psycopg и постоянные соединения (CONN_MAX_AGE) взаимоисключающие:
+    # с пулом соединение возвращается в пул после каждого запроса.
+    DB_POOL = os.getenv('DB_POOL', 'True') == 'True'
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('DB_NAME', 'edu_diary'),
+            'USER': os.getenv('DB_USER', 'postgres'),
+            'PASSWORD': os.getenv('DB_PASSWORD', ''),
+            'HOST': os.getenv('DB_HOST', 'localhost'),
+            'PORT': os.getenv('DB_PORT', '5432'),
+            'CONN_MAX_AGE': 0 if DB_POOL else int(os.getenv('DB_CONN_MAX_AGE', '60')),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+                    'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+                    'timeout': int(os.getenv('DB_POOL_TIMEOUT', '10')),
+                },
+            } if DB_POOL else {},
+        }
+    }
+else:
+    # WAL позволяет читать во время записи, IMMEDIATE берёт блокировку записи в начале
+    # транзакции, а timeout (busy_timeout) заставляет ждать её вместо 'database is locked'.
+    SQLITE_WAL = os.getenv('SQLITE_WAL', 'True') == 'True'
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                # Режим журнала хранится в самом файле базы, поэтому задаётся явно в обоих случаях
+                'init_command': (
+                    'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;' if SQLITE_WAL
+                    else 'PRAGMA journal_mode=DELETE;'
+                ),
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT', '20')),
+            },
+            # Тестовая база — файл, а не память: тесты с параллельными соединениями
+            # проверяют блокировки как в работе. Номер процесса в имени не даёт
+            # столкнуться с базой, оставшейся от прерванного запуска.
+            'TEST': {'NAME': os.getenv(
+                'DB_TEST_NAME', os.path.join(tempfile.gettempdir(), f'edu_diary_test_{os.getpid()}.sqlite3')
+            )},
+        }
+    }
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# При нескольких воркерах нужен общий кэш (Redis, Memcached), иначе
+# инвалидация расписания из одного процесса не дойдёт до остальных.
 
-DATABASES = {
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
     }
 }
 
 
+# Channels
+# https://channels.readthedocs.io/en/stable/topics/channel_layers.html
+# Слой в памяти работает только внутри одного процесса (разработка, тесты). При нескольких
+# воркерах задайте общий слой, например CHANNEL_LAYER_BACKEND=channels_redis.core.RedisChannelLayer
+# и CHANNEL_LAYER_URL=redis://localhost:6379/0 (пакет channels-redis).
+
+CHANNEL_LAYER_URL = os.getenv('CHANNEL_LAYER_URL')
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': os.getenv('CHANNEL_LAYER_BACKEND', 'channels.layers.InMemoryChannelLayer'),
+        'CONFIG': {'hosts': [CHANNEL_LAYER_URL]} if CHANNEL_LAYER_URL else {},
+    }
+}
+
+
+# Архив сообщений чатов
+# python manage.py archive_chat_messages (по расписанию, например раз в сутки из cron)
+# переносит сообщения старше CHAT_ARCHIVE_AFTER_DAYS дней в отдельную таблицу.
+
+CHAT_ARCHIVE_AFTER_DAYS = int(os.getenv('CHAT_ARCHIVE_AFTER_DAYS', '365'))
+
+# Варианты загруженных изображений (edu_diary/images.py) готовятся в фоновых потоках;
+# 0 — в том же потоке сразу после коммита.
+
+IMAGE_VARIANT_WORKERS = int(os.getenv('IMAGE_VARIANT_WORKERS', '2'))
+
+
+# Logging
+# https://docs.djangoproject.com/en/5.2/topics/logging/
+# LOG_LEVEL=DEBUG включает отладочные логи пакетов school и users; при уровне INFO
+# вызовы logger.debug ничего не форматируют. LOG_DEBUG_SAMPLE_RATE — доля запросов
+# (от 0 до 1), для которых отладочные записи действительно пишутся.
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv('LOG_DEBUG_SAMPLE_RATE', '1.0'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'request_id': {'()': 'edu_diary.log.RequestIdFilter'},
+        'debug_sampling': {'()': 'edu_diary.log.DebugSamplingFilter'},
+    },
+    'formatters': {
+        'structured': {
+            'format': 'time=%(asctime)s level=%(levelname)s logger=%(name)s '
+                      'request_id=%(request_id)s msg="%(message)s"',
+        },
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'filters': ['request_id', 'debug_sampling'],
+            'formatter': 'structured',
+        },
+    },
+    'loggers': {
+        'school': {'handlers': ['console'], 'level': LOG_LEVEL, 'propagate': False},
+        'users': {'handlers': ['console'], 'level': LOG_LEVEL, 'propagate': False},
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -38,19 +38,19 @@ def populate_data():
         role='parent'
     )
 
-    Profile.objects.create(user=teacher)
-    Profile.objects.create(user=student, class_number=7, class_letter='Б')
-    Profile.objects.create(user=parent)
-
-    StudentParent.objects.create(student=student, parent=parent)
-
     classroom = Class.objects.create(
         number=7,
         letter='Б',
         teacher=teacher,
-        academic_year='2024-2025'
+        academic_year=Class.current_academic_year()
     )
 
+    Profile.objects.create(user=teacher)
+    Profile.objects.create(user=student, classroom=classroom)
+    Profile.objects.create(user=parent)
+
+    StudentParent.objects.create(student=student, parent=parent)
+
     subject = Subject.objects.create(
         name='Алгебра',
         teacher=teacher
@@ -29,4 +29,4 @@ class StudentAchievementsSummaryView(ListAPIView):
     authentication_classes = [CsrfExemptSessionAuthentication]
 
     def get_queryset(self):
-        return User.objects.filter(role="student").distinct()
\ No newline at end of file
+        return User.objects.filter(role="student").select_related("profile__classroom").distinct()
\ No newline at end of file
@@ -1,9 +1,9 @@
 from django.contrib import admin
 from .homepage.models import Project, ProjectMember, ProjectTask, Event, StudentEvent
-from .diary.models import Class, Subject, Schedule, Grade
+from .diary.models import Class, Subject, Schedule, Grade, GradeAggregate
 from .news.models import News, Category
 from .achievements.models import Achievement, AchievementPlace, AchievementCategory
-from .chat.models import Chat, ChatMessage, ChatParticipant
+from .chat.models import Chat, ChatMessage, ChatParticipant, ArchivedChatMessage
 
 admin.site.register(StudentEvent)
 admin.site.register(Project)
@@ -14,6 +14,7 @@ admin.site.register(Class)
 admin.site.register(Subject)
 admin.site.register(Schedule)
 admin.site.register(Grade)
+admin.site.register(GradeAggregate)
 admin.site.register(News)
 admin.site.register(Achievement)
 admin.site.register(AchievementPlace)
@@ -21,6 +22,7 @@ admin.site.register(AchievementCategory)
 admin.site.register(Chat)
 admin.site.register(ChatMessage)
 admin.site.register(ChatParticipant)
+admin.site.register(ArchivedChatMessage)
 admin.site.register(Category)
 
 
@@ -3,4 +3,9 @@ from django.apps import AppConfig
 class SchoolConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'school'
-    verbose_name = 'Diary'
\ No newline at end of file
+    verbose_name = 'Diary'
+
+    def ready(self):
+        from .chat import signals as chat_signals
+        from .diary import signals
+        from .news import signals as news_signals
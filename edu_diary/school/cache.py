@@ -0,0 +1,37 @@
+import time
+
+from django.core.cache import cache
+
+
+def _version_key(name):
+    return f'version:{name}'
+
+
+def get_version(name):
+    """Текущая версия группы ключей кэша. Смена версии делает старые ключи недоступными."""
+    key = _version_key(name)
+    version = cache.get(key)
+    if version is None:
+        # Начальная версия от времени, чтобы после вытеснения ключа не совпасть со старой
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def get_versions(*names):
+    """Версии нескольких групп за одно обращение к кэшу."""
+    keys = {_version_key(name): name for name in names}
+    found = cache.get_many(list(keys))
+    versions = {}
+    for key, name in keys.items():
+        versions[name] = found[key] if key in found else get_version(name)
+    return [versions[name] for name in names]
+
+
+def bump_version(name):
+    """Инвалидирует все ключи группы."""
+    key = _version_key(name)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
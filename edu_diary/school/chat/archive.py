@@ -0,0 +1,38 @@
+from django.db import transaction
+
+from .models import Chat, ChatMessage, ChatParticipant, ArchivedChatMessage
+
+ARCHIVED_FIELDS = ['id', 'chat_id', 'sender_id', 'message_content', 'created_at', 'updated_at']
+
+
+def protected_message_ids(chat_id):
+    """Сообщения, на которые ссылаются снимок чата и отметки прочтения, остаются в горячей таблице."""
+    ids = set(ChatParticipant.objects.filter(chat_id=chat_id).values_list('last_read_message_id', flat=True))
+    ids.add(Chat.objects.filter(pk=chat_id).values_list('last_message_id', flat=True).first())
+    ids.discard(None)
+    return ids
+
+
+def archive_chat(chat_id, older_than, batch_size=1000):
+    """
+    Переносит сообщения чата старше older_than в ArchivedChatMessage пачками по
+    batch_size; каждая пачка — отдельная транзакция. Возвращает число перенесённых.
+    """
+    protected = protected_message_ids(chat_id)
+    candidates = ChatMessage.objects.filter(chat_id=chat_id, created_at__lt=older_than).exclude(pk__in=protected)
+    moved = 0
+    while True:
+        with transaction.atomic():
+            batch = list(candidates.order_by('created_at', 'id').values(*ARCHIVED_FIELDS)[:batch_size])
+            if not batch:
+                return moved
+            ArchivedChatMessage.objects.bulk_create([ArchivedChatMessage(**row) for row in batch])
+            # delete() вызывает сигналы, и сообщения уходят из поискового индекса
+            ChatMessage.objects.filter(pk__in=[row['id'] for row in batch]).delete()
+        moved += len(batch)
+
+
+def archive_messages(older_than, batch_size=1000):
+    """Архивирует все чаты; идёт по чатам, чтобы выборка шла по индексу (chat, created_at)."""
+    chat_ids = Chat.objects.filter(messages__created_at__lt=older_than).values_list('pk', flat=True).distinct()
+    return {chat_id: archive_chat(chat_id, older_than, batch_size) for chat_id in list(chat_ids)}
@@ -0,0 +1,62 @@
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from .models import ChatParticipant
+from .realtime import chat_group, user_group
+
+
+class ChatConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Поток событий чатов пользователя: новые сообщения, отметки прочтения
+    и изменения счётчика непрочитанных. Клиент только слушает; сообщения
+    отправляются и читаются через REST API.
+    """
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close(code=4401)
+            return
+        self.user_id = user.id
+        self.subscriptions = [user_group(user.id)]
+        self.subscriptions += [chat_group(chat_id) for chat_id in await self.get_chat_ids()]
+        for group in self.subscriptions:
+            await self.channel_layer.group_add(group, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        for group in getattr(self, 'subscriptions', []):
+            await self.channel_layer.group_discard(group, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        pass
+
+    @database_sync_to_async
+    def get_chat_ids(self):
+        return list(ChatParticipant.objects.filter(user_id=self.user_id).values_list('chat_id', flat=True))
+
+    async def chat_message(self, event):
+        await self.send_json({
+            'type': 'message',
+            'chat': event['chat'],
+            'message': event['message'],
+            'unread_increment': int(event['message']['sender'] != self.user_id),
+        })
+
+    async def chat_read(self, event):
+        await self.send_json({
+            'type': 'read',
+            'chat': event['chat'],
+            'user': event['user'],
+            'last_read_message_id': event['last_read_message_id'],
+        })
+
+    async def chat_unread(self, event):
+        await self.send_json({'type': 'unread', 'chat': event['chat'], 'unread_count': event['unread_count']})
+
+    async def chat_joined(self, event):
+        group = chat_group(event['chat'])
+        if group not in self.subscriptions:
+            self.subscriptions.append(group)
+            await self.channel_layer.group_add(group, self.channel_name)
+        await self.send_json({'type': 'joined', 'chat': event['chat']})
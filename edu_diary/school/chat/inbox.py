@@ -0,0 +1,35 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Sum, Window
+
+from .models import ChatParticipant
+
+INBOX_CACHE_TIMEOUT = 60 * 5
+INBOX_MAX_CHATS = 20
+
+
+def inbox_key(user_id):
+    return f'chat:inbox:{user_id}'
+
+
+def fetch_inbox(user, limit=INBOX_MAX_CHATS):
+    """
+    Сводка входящих одним запросом по ChatParticipant: последние чаты пользователя
+    и, оконной суммой по всем его участиям, общее число непрочитанных.
+    """
+    participants = list(
+        ChatParticipant.objects.filter(user=user)
+        .select_related('chat')
+        .annotate(total_unread=Window(Sum('unread_count')))
+        .order_by(F('chat__last_message_at').desc(nulls_last=True), '-chat_id')[:limit]
+    )
+    return {
+        'total_unread': participants[0].total_unread if participants else 0,
+        'chats': participants,
+    }
+
+
+def invalidate_inbox(user_ids):
+    """Сбрасывает закэшированные сводки после коммита транзакции."""
+    keys = [inbox_key(user_id) for user_id in user_ids]
+    transaction.on_commit(lambda: cache.delete_many(keys))
@@ -1,9 +1,14 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import OuterRef, Prefetch, Q, Subquery
 from django.contrib.auth import get_user_model
+
+from edu_diary.images import VariantImageField
 from .choices import ChatTypeEnum, ChatParticipantRoleEnum
 
 User = get_user_model()
 
+LAST_MESSAGE_PREVIEW_LENGTH = 100
+
 
 class TimeStamp(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
@@ -13,11 +18,36 @@ class TimeStamp(models.Model):
         abstract = True
 
 
+class ChatQuerySet(models.QuerySet):
+    def for_user(self, user):
+        """
+        Чаты пользователя для списка: последнее сообщение берётся из снимка в самом
+        чате, непрочитанные — подзапросом, участники — одним prefetch.
+        """
+        unread_count = ChatParticipant.objects.filter(chat=OuterRef('pk'), user=user)
+        return self.filter(chat_participants__user=user).annotate(
+            user_unread_count=Subquery(unread_count.values('unread_count')[:1]),
+        ).prefetch_related(
+            Prefetch('chat_participants', queryset=ChatParticipant.objects.order_by('id'))
+        )
+
+
 class Chat(TimeStamp):
     title = models.CharField(max_length=255)
     type = models.CharField(choices=ChatTypeEnum.choices, default=ChatTypeEnum.PRIVATE, max_length=8)
-    avatar = models.ImageField(upload_to='media/chat_avatars/', blank=True, null=True)
+    avatar = VariantImageField(
+        upload_to='media/chat_avatars/', blank=True, null=True, variants_field='avatar_variants_ready'
+    )
+    avatar_variants_ready = models.BooleanField(default=False, editable=False)
     last_message_at = models.DateTimeField(null=True, blank=True)
+    # Снимок последнего сообщения, чтобы список чатов не читал ChatMessage
+    last_message = models.ForeignKey('ChatMessage', on_delete=models.SET_NULL, null=True, blank=True,
+                                     related_name='+')
+    last_message_sender = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True,
+                                            related_name='+')
+    last_message_preview = models.CharField(max_length=LAST_MESSAGE_PREVIEW_LENGTH, blank=True)
+
+    objects = ChatQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Чат"
@@ -29,19 +59,51 @@ class Chat(TimeStamp):
     def get_last_message(self):
         return self.messages.order_by('-created_at').first()
 
+    def set_last_message(self, message):
+        """
+        Обновляет снимок последнего сообщения одним UPDATE. Более раннее сообщение,
+        сохранённое параллельно, не затирает более позднее.
+        """
+        snapshot = {
+            'last_message': message,
+            'last_message_sender_id': message.sender_id,
+            'last_message_preview': message.message_content[:LAST_MESSAGE_PREVIEW_LENGTH],
+            'last_message_at': message.created_at,
+        }
+        Chat.objects.filter(
+            Q(last_message_at__isnull=True) | Q(last_message_at__lte=message.created_at),
+            pk=self.pk,
+        ).update(**snapshot)
+        for field, value in snapshot.items():
+            setattr(self, field, value)
+
+    def read_watermarks(self):
+        """Отметки прочтения участников: {user_id: last_read_message_id}."""
+        return dict(self.chat_participants.values_list('user_id', 'last_read_message_id'))
+
     def get_unread_count_for_user(self, user):
+        if hasattr(self, 'user_unread_count'):
+            return self.user_unread_count or 0
         participant = self.chat_participants.filter(user=user).first()
         if not participant:
             return 0
         return participant.unread_count
 
-    def change_type(self):
-        participants_count = self.chat_participants.count()
+    @staticmethod
+    def type_for(participants_count):
+        return ChatTypeEnum.GROUP if participants_count > 2 else ChatTypeEnum.PRIVATE
 
-        if participants_count > 2:
-            new_type = 'GROUP'
-        else:
-            new_type = 'PRIVATE'
+    def add_participants(self, users, role=ChatParticipantRoleEnum.MEMBER):
+        """Добавляет участников одним INSERT и один раз пересчитывает тип чата."""
+        with transaction.atomic():
+            participants = ChatParticipant.objects.bulk_create(
+                [ChatParticipant(chat=self, user=user, role=role) for user in users]
+            )
+            self.change_type()
+        return participants
+
+    def change_type(self):
+        new_type = self.type_for(self.chat_participants.count())
 
         if self.type != new_type:
             self.type = new_type
@@ -50,23 +112,60 @@ class Chat(TimeStamp):
         return self.type
 
 
-class ChatMessage(TimeStamp):
+class MessageBase(models.Model):
+    message_content = models.TextField()
+
+    class Meta:
+        abstract = True
+
+    def __str__(self):
+        return f"{self.sender}: {self.message_content[:20]}"
+
+    def read_count(self, watermarks):
+        """
+        Сколько участников, кроме отправителя, прочитали сообщение.
+
+        watermarks — {user_id: last_read_message_id} участников чата (см. Chat.read_watermarks);
+        сообщение прочитано, если отметка участника не меньше его id.
+        """
+        return sum(
+            1 for user_id, last_read_id in watermarks.items()
+            if user_id != self.sender_id and last_read_id is not None and last_read_id >= self.id
+        )
+
+
+class ChatMessage(TimeStamp, MessageBase):
     sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='messages')
     chat = models.ForeignKey(Chat, on_delete=models.CASCADE, related_name='messages')
-    message_content = models.TextField()
-    read_by = models.ManyToManyField(User, related_name='read_messages', blank=True)
 
     class Meta:
         verbose_name = "Сообщение"
         verbose_name_plural = "Сообщения"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['chat', '-created_at', '-id'], name='chatmessage_chat_created_idx'),
+        ]
+
+
+class ArchivedChatMessage(MessageBase):
+    """
+    Сообщение, перенесённое из ChatMessage командой archive_chat_messages.
+    id и даты сохраняются, поэтому курсоры истории чата продолжают работать.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_messages')
+    chat = models.ForeignKey(Chat, on_delete=models.CASCADE, related_name='archived_messages')
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
 
-    def __str__(self):
-        return f"{self.sender}: {self.message_content[:20]}"
-
-    def mark_as_read_by(self, user):
-        self.read_by.add(user)
-        self.save()
+    class Meta:
+        verbose_name = "Архивное сообщение"
+        verbose_name_plural = "Архивные сообщения"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['chat', '-created_at', '-id'], name='archivedmsg_chat_created_idx'),
+        ]
 
 
 class ChatParticipant(TimeStamp):
@@ -82,19 +181,18 @@ class ChatParticipant(TimeStamp):
         verbose_name = "Участник чата"
         verbose_name_plural = "Участники чата"
         unique_together = ['user', 'chat']
+        indexes = [
+            models.Index(fields=['chat', 'user', 'role'], name='chatparticipant_chat_role_idx'),
+        ]
 
     def __str__(self):
         return f'{self.user} -> {self.chat}'
 
     def mark_messages_as_read(self):
-        unread_messages = self.chat.messages.exclude(read_by=self.user).order_by('-created_at')
-
-        if unread_messages.exists():
-            self.last_read_message = unread_messages.first()
-
-            for message in unread_messages:
-                message.read_by.add(self.user)
-
-            self.unread_count = 0
-            self.save()
-
+        """
+        Переносит отметку прочтения на последнее сообщение чата одним UPDATE,
+        сколько бы сообщений ни было непрочитано.
+        """
+        last_message = Chat.objects.filter(pk=OuterRef('chat_id')).values('last_message_id')[:1]
+        ChatParticipant.objects.filter(pk=self.pk).update(last_read_message_id=Subquery(last_message), unread_count=0)
+        self.refresh_from_db(fields=['last_read_message', 'unread_count'])
@@ -0,0 +1,55 @@
+from rest_framework.exceptions import ValidationError
+
+from school.pagination import KeysetPagination
+
+
+class ChatMessagePagination(KeysetPagination):
+    """
+    История сообщений чата по ключу (created_at, id), сначала новые.
+
+    Кроме курсоров before/after поддерживает since_id — сообщения новее указанного,
+    чтобы догнать переписку после переподключения. Если у представления есть
+    get_archive_queryset(), архивные сообщения подмешиваются в ту же ленту.
+    """
+    page_size = 50
+    since_query_param = 'since_id'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        get_archive_queryset = getattr(view, 'get_archive_queryset', None)
+        self.archive_queryset = get_archive_queryset() if get_archive_queryset else None
+        return super().paginate_queryset(queryset, request, view)
+
+    def fetch(self, queryset, direction, position, limit):
+        rows = super().fetch(queryset, direction, position, limit)
+        if self.archive_queryset is None:
+            return rows
+        # Те же условия по ключу для архива; страница собирается слиянием двух отсортированных выборок
+        rows += super().fetch(self.archive_queryset, direction, position, limit)
+        rows.sort(key=self.key_for, reverse=direction != 'after')
+        return rows[:limit]
+
+    def get_position(self, queryset, request):
+        since_id = request.query_params.get(self.since_query_param)
+        if not since_id:
+            return super().get_position(queryset, request)
+        message = {"detail": "Сообщение since_id не найдено в этом чате."}
+        try:
+            since_id = int(since_id)
+        except ValueError:
+            raise ValidationError(message)
+        for source in (queryset, self.archive_queryset):
+            if source is not None:
+                position = source.filter(pk=since_id).values_list(*self.fields).first()
+                if position is not None:
+                    return 'after', list(position)
+        raise ValidationError(message)
+
+    def get_position_query_params(self):
+        return [*super().get_position_query_params(), self.since_query_param]
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            *super().get_schema_operation_parameters(view),
+            {'name': self.since_query_param, 'required': False, 'in': 'query',
+             'description': 'Сообщения новее сообщения с этим id', 'schema': {'type': 'integer'}},
+        ]
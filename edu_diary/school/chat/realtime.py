@@ -0,0 +1,57 @@
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+
+def chat_group(chat_id):
+    return f'chat.{chat_id}'
+
+
+def user_group(user_id):
+    return f'chat.user.{user_id}'
+
+
+def _send(group, event):
+    channel_layer = get_channel_layer()
+    if channel_layer is not None:
+        async_to_sync(channel_layer.group_send)(group, event)
+
+
+def _send_on_commit(group, event):
+    # Подписчики узнают об изменении только после того, как оно видно в базе
+    transaction.on_commit(lambda: _send(group, event))
+
+
+def broadcast_message(message):
+    """Новое сообщение всем подписчикам чата; получатели увеличивают у себя счётчик непрочитанных."""
+    _send_on_commit(chat_group(message.chat_id), {
+        'type': 'chat.message',
+        'chat': message.chat_id,
+        'message': {
+            'id': message.id,
+            'sender': message.sender_id,
+            'message_content': message.message_content,
+            'created_at': message.created_at.isoformat(),
+        },
+    })
+
+
+def broadcast_read(participant):
+    """Новая отметка прочтения участника — всем в чате, обнулённый счётчик — ему самому."""
+    _send_on_commit(chat_group(participant.chat_id), {
+        'type': 'chat.read',
+        'chat': participant.chat_id,
+        'user': participant.user_id,
+        'last_read_message_id': participant.last_read_message_id,
+    })
+    _send_on_commit(user_group(participant.user_id), {
+        'type': 'chat.unread',
+        'chat': participant.chat_id,
+        'unread_count': participant.unread_count,
+    })
+
+
+def notify_joined(chat_id, user_ids):
+    """Добавленные участники подписываются на чат без переподключения."""
+    for user_id in user_ids:
+        _send_on_commit(user_group(user_id), {'type': 'chat.joined', 'chat': chat_id})
@@ -0,0 +1,5 @@
+from school.search import SearchIndex
+from .models import Chat, ChatMessage
+
+message_index = SearchIndex(ChatMessage, 'message_content')
+chat_title_index = SearchIndex(Chat, 'title')
@@ -1,6 +1,10 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from drf_spectacular.utils import extend_schema_field
 
+from edu_diary.images import ImageVariantsField
+from school.serializers import PrimaryKeyListField
 from .choices import ChatParticipantRoleEnum
 from .models import Chat, ChatMessage, ChatParticipant
 
@@ -8,25 +12,62 @@ User = get_user_model()
 
 
 class UserShortSerializer(serializers.ModelSerializer):
+    avatar_variants = ImageVariantsField(source='avatar')
+
     class Meta:
         model = User
-        fields = ['id', 'username', 'avatar', 'role']
+        fields = ['id', 'username', 'avatar', 'avatar_variants', 'role']
 
 
 # chat/serializers.py
 class ChatMessageSerializer(serializers.ModelSerializer):
     sender = UserShortSerializer(read_only=True)
-    read_by = UserShortSerializer(many=True, read_only=True)
+    read_count = serializers.SerializerMethodField()
 
     class Meta:
         model = ChatMessage
-        fields = ['id', 'sender', 'chat', 'message_content', 'created_at', 'read_by']
-        read_only_fields = ['id', 'sender', 'created_at', 'read_by', 'chat']
+        fields = ['id', 'sender', 'chat', 'message_content', 'created_at', 'read_count']
+        read_only_fields = ['id', 'sender', 'created_at', 'read_count', 'chat']
+
+    def get_read_count(self, obj) -> int:
+        watermarks = self.context.get('read_watermarks')
+        if watermarks is None:
+            watermarks = obj.chat.read_watermarks()
+        return obj.read_count(watermarks)
+
+
+class ChatLastMessageSerializer(serializers.Serializer):
+    """Превью последнего сообщения из снимка в Chat, без обращения к ChatMessage."""
+    id = serializers.IntegerField(source='last_message_id')
+    sender = serializers.IntegerField(source='last_message_sender_id', allow_null=True)
+    preview = serializers.CharField(source='last_message_preview')
+    created_at = serializers.DateTimeField(source='last_message_at')
+
+
+class InboxChatSerializer(serializers.Serializer):
+    id = serializers.IntegerField(source='chat_id')
+    title = serializers.CharField(source='chat.title')
+    type = serializers.CharField(source='chat.type')
+    avatar = serializers.ImageField(source='chat.avatar')
+    avatar_variants = ImageVariantsField(source='chat.avatar')
+    unread_count = serializers.IntegerField()
+    last_message_at = serializers.DateTimeField(source='chat.last_message_at')
+    last_message = serializers.SerializerMethodField()
+
+    @extend_schema_field(ChatLastMessageSerializer(allow_null=True))
+    def get_last_message(self, obj):
+        if obj.chat.last_message_id is None:
+            return None
+        return ChatLastMessageSerializer(obj.chat).data
+
+
+class InboxSerializer(serializers.Serializer):
+    total_unread = serializers.IntegerField()
+    chats = InboxChatSerializer(many=True)
 
 
 class ChatParticipantSerializer(serializers.ModelSerializer):
-        users = serializers.PrimaryKeyRelatedField(queryset=User.objects.all(), many=True, write_only=True,
-                                                   required=True)
+        users = PrimaryKeyListField(queryset=User.objects.all(), write_only=True, required=True)
         update_chat_type = serializers.SerializerMethodField()
 
         class Meta:
@@ -35,45 +76,28 @@ class ChatParticipantSerializer(serializers.ModelSerializer):
             read_only_fields = ['id', 'last_read_message', 'unread_count', 'chat', 'role', 'update_chat_type']
 
         def get_update_chat_type(self, obj):
-            return obj.chat.change_type()
+            # Тип чата поддерживается при изменении состава участников, чтение ничего не пишет
+            return obj.chat.type
 
         def create(self, validated_data):
             users = validated_data.pop('users')
             chat = validated_data.get('chat')
             role = validated_data.get('role', ChatParticipantRoleEnum.MEMBER)
-
-            # Создаем список участников для всех пользователей
-            participants = []
-            for user in users:
-                participant = ChatParticipant.objects.create(
-                    chat=chat,
-                    user=user,
-                    role=role
-                )
-                participants.append(participant)
-
-            # Обновляем тип чата
-            chat.change_type()
-
+            participants = chat.add_participants(users, role)
             # Возвращаем первого созданного участника
-            # или можно логически решить, какой участник должен быть возвращен
             return participants[0] if participants else None
 
 
 class ChatSerializer(serializers.ModelSerializer):
-    users = serializers.PrimaryKeyRelatedField(
-        queryset=User.objects.all(),
-        many=True,
-        write_only=True,
-        required=True
-    )
+    users = PrimaryKeyListField(queryset=User.objects.all(), write_only=True, required=True)
     last_message = serializers.SerializerMethodField()
     unread_count = serializers.SerializerMethodField()
     participants = serializers.SerializerMethodField()
+    avatar_variants = ImageVariantsField(source='avatar')
 
     class Meta:
         model = Chat
-        fields = ['id', 'users', 'title', 'type', 'avatar', 'last_message_at', 'last_message', 'unread_count', 'participants']
+        fields = ['id', 'users', 'title', 'type', 'avatar', 'avatar_variants', 'last_message_at', 'last_message', 'unread_count', 'participants']
 
     def validate_users(self, value):
         if not value:
@@ -82,11 +106,11 @@ class ChatSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Вы не можете добавить себя в чат.")
         return value
 
+    @extend_schema_field(ChatLastMessageSerializer(allow_null=True))
     def get_last_message(self, obj):
-        last_message = obj.get_last_message()
-        if last_message:
-            return ChatMessageSerializer(last_message).data
-        return None
+        if obj.last_message_id is None:
+            return None
+        return ChatLastMessageSerializer(obj).data
 
     def get_unread_count(self, obj):
         return obj.get_unread_count_for_user(self.context['request'].user)
@@ -97,21 +121,12 @@ class ChatSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         users = validated_data.pop('users')
-        chat = Chat.objects.create(**validated_data)
-
-        ChatParticipant.objects.create(
-            chat=chat,
-            user=self.context['request'].user,
-            role=ChatParticipantRoleEnum.ADMIN
-        )
-        for user in users:
-            ChatParticipant.objects.create(
-                chat=chat,
-                user=user,
-                role=ChatParticipantRoleEnum.MEMBER
-            )
-
+        request_user = self.context['request'].user
+        with transaction.atomic():
+            # Состав известен заранее, поэтому тип чата задаётся сразу, без пересчёта
+            chat = Chat.objects.create(type=Chat.type_for(len(users) + 1), **validated_data)
+            ChatParticipant.objects.bulk_create([
+                ChatParticipant(chat=chat, user=request_user, role=ChatParticipantRoleEnum.ADMIN),
+                *(ChatParticipant(chat=chat, user=user, role=ChatParticipantRoleEnum.MEMBER) for user in users),
+            ])
         return chat
-
-
-
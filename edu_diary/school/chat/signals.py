@@ -0,0 +1,35 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from edu_diary.images import variants_ready
+from .inbox import invalidate_inbox
+from .models import Chat, ChatMessage, ChatParticipant
+from .search import chat_title_index, message_index
+
+
+@receiver(post_save, sender=ChatMessage)
+def index_message(sender, instance, using, update_fields=None, **kwargs):
+    if update_fields is None or 'message_content' in update_fields:
+        message_index.update([instance], using=using)
+
+
+@receiver(post_delete, sender=ChatMessage)
+def unindex_message(sender, instance, using, **kwargs):
+    message_index.remove([instance.pk], using=using)
+
+
+@receiver(post_save, sender=Chat)
+def index_chat_title(sender, instance, using, update_fields=None, **kwargs):
+    if update_fields is None or 'title' in update_fields:
+        chat_title_index.update([instance], using=using)
+
+
+@receiver(post_delete, sender=Chat)
+def unindex_chat_title(sender, instance, using, **kwargs):
+    chat_title_index.remove([instance.pk], using=using)
+
+
+@receiver(variants_ready, sender=Chat)
+def chat_avatar_variants_ready(sender, name, **kwargs):
+    # Закэшированные сводки входящих отдают avatar_variants = null, пока варианты готовились
+    invalidate_inbox(ChatParticipant.objects.filter(chat__avatar=name).values_list('user_id', flat=True))
@@ -6,6 +6,7 @@ from .views import (
     ChatParticipantListView,
     MarkAllMessagesAsReadView,
     AddChatParticipantView, ChatSearchView,
+    ChatInboxView,
 )
 
 app_name = 'chat'
@@ -15,6 +16,7 @@ urlpatterns = [
 
     path('chats/<int:pk>/', ChatRetrieveView.as_view(), name='chat-detail'),
     path('chats/search/', ChatSearchView.as_view(), name='chat-search'),
+    path('chats/inbox/', ChatInboxView.as_view(), name='chat-inbox'),
     path('chats/<int:chat_id>/messages/', ChatMessageListCreateView.as_view(), name='chat-messages'),
     path('chats/<int:chat_id>/read/', MarkAllMessagesAsReadView.as_view(), name='mark-read'),
 
@@ -2,11 +2,18 @@ from rest_framework import generics, permissions, status
 from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
+from django.core.cache import cache
 from django.shortcuts import get_object_or_404
-from drf_spectacular.utils import extend_schema, extend_schema_view
-from .models import Chat, ChatMessage, ChatParticipant
-from .serializers import ChatSerializer, ChatMessageSerializer, ChatParticipantSerializer
+from drf_spectacular.utils import extend_schema, extend_schema_view, OpenApiParameter
+from .models import Chat, ChatMessage, ChatParticipant, ArchivedChatMessage
+from .serializers import ChatSerializer, ChatMessageSerializer, ChatParticipantSerializer, InboxSerializer
+from .inbox import INBOX_CACHE_TIMEOUT, INBOX_MAX_CHATS, fetch_inbox, inbox_key, invalidate_inbox
 from .choices import ChatParticipantRoleEnum
+from .pagination import ChatMessagePagination
+from .realtime import broadcast_message, broadcast_read, notify_joined
+from .search import chat_title_index, message_index
 from users.custom_auth import CsrfExemptSessionAuthentication
 
 @extend_schema_view(
@@ -19,7 +26,44 @@ class ChatListCreateView(generics.ListCreateAPIView):
     authentication_classes = [CsrfExemptSessionAuthentication]
 
     def get_queryset(self):
-        return Chat.objects.filter(chat_participants__user=self.request.user).distinct()
+        return Chat.objects.for_user(self.request.user)
+
+    def perform_create(self, serializer):
+        chat = serializer.save()
+        member_ids = [self.request.user.id, *(user.id for user in serializer.validated_data['users'])]
+        invalidate_inbox(member_ids)
+        notify_joined(chat.id, member_ids)
+
+class ChatInboxView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    authentication_classes = [CsrfExemptSessionAuthentication]
+
+    @extend_schema(
+        summary="Сводка входящих: всего непрочитанных и последние чаты",
+        parameters=[
+            OpenApiParameter(name='limit', description=f'Сколько чатов вернуть (до {INBOX_MAX_CHATS})',
+                             type=int, required=False),
+        ],
+        responses=InboxSerializer,
+    )
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get('limit', 5))
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= INBOX_MAX_CHATS:
+            return Response(
+                {"detail": f"Параметр limit должен быть числом от 1 до {INBOX_MAX_CHATS}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # В кэше лежит сводка с максимальным числом чатов, limit только обрезает её
+        key = inbox_key(request.user.id)
+        inbox = cache.get(key)
+        if inbox is None:
+            inbox = InboxSerializer(fetch_inbox(request.user), context={'request': request}).data
+            cache.set(key, inbox, INBOX_CACHE_TIMEOUT)
+        return Response({**inbox, 'chats': inbox['chats'][:limit]})
 
 @extend_schema(summary="Получить детали чата")
 class ChatRetrieveView(generics.RetrieveAPIView):
@@ -28,7 +72,7 @@ class ChatRetrieveView(generics.RetrieveAPIView):
     authentication_classes = [CsrfExemptSessionAuthentication]  # Добавляем
 
     def get_queryset(self):
-        return Chat.objects.filter(chat_participants__user=self.request.user)
+        return Chat.objects.for_user(self.request.user)
 
 @extend_schema(summary="Поиск чатов по названию")
 class ChatSearchView(generics.ListAPIView):
@@ -38,10 +82,10 @@ class ChatSearchView(generics.ListAPIView):
 
     def get_queryset(self):
         search_query = self.request.query_params.get('search', '')
-        return Chat.objects.filter(
-            chat_participants__user=self.request.user,
-            title__icontains=search_query
-        ).distinct()
+        chats = Chat.objects.for_user(self.request.user)
+        if not search_query:
+            return chats
+        return chat_title_index.search(chats, search_query)
 
 @extend_schema_view(
     list=extend_schema(summary="Получить сообщения чата"),
@@ -50,6 +94,7 @@ class ChatSearchView(generics.ListAPIView):
 
 class ChatMessageListCreateView(generics.ListCreateAPIView):
     serializer_class = ChatMessageSerializer
+    pagination_class = ChatMessagePagination
     permission_classes = [permissions.IsAuthenticated]
     authentication_classes = [CsrfExemptSessionAuthentication]
 
@@ -58,24 +103,52 @@ class ChatMessageListCreateView(generics.ListCreateAPIView):
         chat = get_object_or_404(Chat, id=chat_id)
         if not ChatParticipant.objects.filter(chat=chat, user=self.request.user).exists():
             raise PermissionDenied("Вы не участник чата.")
-        search_params = self.request.query_params.get('search')
-        if search_params:
-            return ChatMessage.objects.filter(chat_id=chat_id, message_content__icontains=search_params).order_by('-created_at')
-        return ChatMessage.objects.filter(chat_id=chat_id).order_by('-created_at')
+        return ChatMessage.objects.filter(chat_id=chat_id).select_related('sender')
+
+    def get_archive_queryset(self):
+        return ArchivedChatMessage.objects.filter(chat_id=self.kwargs['chat_id']).select_related('sender')
+
+    def list(self, request, *args, **kwargs):
+        search_params = request.query_params.get('search')
+        if not search_params:
+            return super().list(request, *args, **kwargs)
+        # Результаты поиска упорядочены по релевантности, поэтому отдаются одной страницей
+        messages = message_index.search(self.get_queryset(), search_params)
+        messages = messages[:self.paginator.get_page_size(request)]
+        serializer = self.get_serializer(messages, many=True)
+        return Response({'next': None, 'previous': None, 'results': serializer.data})
 
     def perform_create(self, serializer):
         chat_id = self.kwargs['chat_id']
         chat = get_object_or_404(Chat, id=chat_id)
         if not ChatParticipant.objects.filter(chat=chat, user=self.request.user).exists():
             raise PermissionDenied("Вы не участник чата.")
-        # Передаем chat в serializer.save
-        message = serializer.save(sender=self.request.user, chat=chat)
-        chat.last_message_at = message.created_at
-        chat.save()
-        participants = ChatParticipant.objects.filter(chat=chat).exclude(user=self.request.user)
-        for participant in participants:
-            participant.unread_count += 1
-            participant.save()
+        with transaction.atomic():
+            # Передаем chat в serializer.save
+            message = serializer.save(sender=self.request.user, chat=chat)
+            chat.set_last_message(message)
+            # Один UPDATE на всех участников: получателям инкремент выполняет база, поэтому
+            # параллельные отправители не теряют обновления; отправитель читает свой же текст
+            sender = Q(user=self.request.user)
+            ChatParticipant.objects.filter(chat=chat).update(
+                unread_count=Case(When(sender, then=Value(0)), default=F('unread_count') + 1),
+                last_read_message=Case(
+                    When(sender, then=Value(message.id)), default=F('last_read_message'),
+                    output_field=ChatParticipant._meta.get_field('last_read_message'),
+                ),
+            )
+            invalidate_inbox(ChatParticipant.objects.filter(chat=chat).values_list('user_id', flat=True))
+            broadcast_message(message)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        chat_id = self.kwargs.get('chat_id')
+        if chat_id is not None:
+            # Отметки прочтения участников читаются один раз на страницу сообщений
+            context['read_watermarks'] = dict(
+                ChatParticipant.objects.filter(chat_id=chat_id).values_list('user_id', 'last_read_message_id')
+            )
+        return context
 
 @extend_schema(summary="Получить список участников чата")
 class ChatParticipantListView(generics.ListAPIView):
@@ -88,7 +161,7 @@ class ChatParticipantListView(generics.ListAPIView):
         chat = get_object_or_404(Chat, id=chat_id)
         if not ChatParticipant.objects.filter(chat=chat, user=self.request.user).exists():
             raise PermissionDenied("Вы не участник чата!")
-        return ChatParticipant.objects.filter(chat_id=chat_id)
+        return ChatParticipant.objects.filter(chat_id=chat_id).select_related('chat')
 
 @extend_schema(summary="Отметить все сообщения в чате как прочитанные")
 class MarkAllMessagesAsReadView(APIView):
@@ -99,6 +172,8 @@ class MarkAllMessagesAsReadView(APIView):
         chat = get_object_or_404(Chat, id=chat_id)
         participant = get_object_or_404(ChatParticipant, chat=chat, user=request.user)
         participant.mark_messages_as_read()
+        invalidate_inbox([request.user.id])
+        broadcast_read(participant)
         return Response({"detail": "Все сообщения помечены как прочитанные."}, status=status.HTTP_200_OK)
 
 @extend_schema(summary="Добавить нового участника в чат")
@@ -113,15 +188,21 @@ class AddChatParticipantView(generics.CreateAPIView):
 
     def perform_create(self, serializer):
         chat_id = self.kwargs.get('chat_id')
-        chat = get_object_or_404(Chat, id=chat_id)
         users = serializer.validated_data['users']
-        if not ChatParticipant.objects.filter(
-                chat=chat,
-                user=self.request.user,
-                role=ChatParticipantRoleEnum.ADMIN
-        ).exists():
-            raise PermissionDenied("Только администратор чата может добавлять участников.")
-        for user in users:
-            if ChatParticipant.objects.filter(chat=chat, user=user).exists():
-                raise ValidationError({"detail": f"Пользователь {user.username} уже в чате."})
-        serializer.save(chat=chat, role=ChatParticipantRoleEnum.MEMBER)
\ No newline at end of file
+        with transaction.atomic():
+            # Блокировка чата выстраивает параллельные добавления в очередь: проверка
+            # на уже добавленных видит участников, записанных предыдущим запросом
+            chat = get_object_or_404(Chat.objects.select_for_update(), id=chat_id)
+            if not ChatParticipant.objects.filter(
+                    chat=chat,
+                    user=self.request.user,
+                    role=ChatParticipantRoleEnum.ADMIN
+            ).exists():
+                raise PermissionDenied("Только администратор чата может добавлять участников.")
+            existing = set(ChatParticipant.objects.filter(chat=chat, user__in=users).values_list('user_id', flat=True))
+            for user in users:
+                if user.id in existing:
+                    raise ValidationError({"detail": f"Пользователь {user.username} уже в чате."})
+            serializer.save(chat=chat, role=ChatParticipantRoleEnum.MEMBER)
+        invalidate_inbox([user.id for user in users])
+        notify_joined(chat.id, [user.id for user in users])
\ No newline at end of file
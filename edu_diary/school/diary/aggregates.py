@@ -0,0 +1,78 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Max, OuterRef, Q, Subquery, Value, When
+
+from .models import Grade, GradeAggregate
+
+COUNTER_FIELDS = ['count', 'total', 'count_2', 'count_3', 'count_4', 'count_5']
+
+
+def apply_grade_deltas(deltas):
+    """
+    Применяет изменения оценок к сводкам GradeAggregate.
+
+    deltas — последовательность (student_id, subject_id, value, date, sign), где sign
+    равен +1 для добавленной оценки и -1 для удалённой; изменение оценки — это пара
+    из удаления старого значения и добавления нового.
+
+    Недостающие сводки вставляются с нулями (INSERT ... ON CONFLICT DO NOTHING), затем
+    все затронутые сводки меняются одним UPDATE с приращениями count = count + delta.
+    Строку при этом блокирует сама база, поэтому параллельные записи — в том числе две
+    первые оценки по одной паре ученик/предмет — не теряют приращений. Дата последней
+    оценки пересчитывается подзапросом в том же UPDATE.
+    """
+    deltas = [delta for delta in deltas if delta[0] and delta[1] and delta[2]]
+    if not deltas:
+        return
+
+    changes = defaultdict(lambda: dict.fromkeys(COUNTER_FIELDS, 0))
+    added = set()
+    for student_id, subject_id, value, date, sign in deltas:
+        key = (student_id, subject_id)
+        change = changes[key]
+        change['count'] += sign
+        change['total'] += sign * value
+        change[f'count_{value}'] += sign
+        if sign > 0:
+            added.add(key)
+
+    def increment(field):
+        whens = [
+            When(student_id=student_id, subject_id=subject_id, then=Value(change[field]))
+            for (student_id, subject_id), change in changes.items() if change[field]
+        ]
+        if not whens:
+            return F(field)
+        return F(field) + Case(*whens, default=Value(0), output_field=IntegerField())
+
+    condition = Q()
+    for student_id, subject_id in changes:
+        condition |= Q(student_id=student_id, subject_id=subject_id)
+
+    with transaction.atomic():
+        # Сводку создаём только под добавленные оценки: при удалении каскадом
+        # вместе с учеником или предметом её уже нет, и UPDATE её просто не найдёт
+        GradeAggregate.objects.bulk_create(
+            [GradeAggregate(student_id=student_id, subject_id=subject_id) for student_id, subject_id in added],
+            ignore_conflicts=True,
+        )
+        GradeAggregate.objects.filter(condition).update(
+            **{field: increment(field) for field in COUNTER_FIELDS},
+            last_date=Subquery(
+                Grade.objects.filter(student_id=OuterRef('student_id'), subject_id=OuterRef('subject_id'))
+                .order_by().values('student_id').annotate(last_date=Max('date')).values('last_date')
+            ),
+        )
+
+
+def grade_deltas(old_key, new_key):
+    """Дельты для перехода оценки из состояния old_key в new_key (любое может быть None)."""
+    if old_key == new_key:
+        return []
+    deltas = []
+    if old_key and old_key[2]:
+        deltas.append((*old_key, -1))
+    if new_key and new_key[2]:
+        deltas.append((*new_key, 1))
+    return deltas
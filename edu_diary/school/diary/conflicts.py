@@ -0,0 +1,54 @@
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+
+
+def find_overlaps(lessons):
+    """
+    Находит пересекающиеся уроки за один проход.
+
+    Уроки группируются по (классу, дню недели) и сортируются по времени начала;
+    урок пересекается с предыдущими, если начинается раньше, чем закончился
+    самый поздний из них. Возвращает список пар (урок, урок).
+    """
+    groups = defaultdict(list)
+    for lesson in lessons:
+        groups[(lesson.classroom_id, lesson.day_of_week)].append(lesson)
+
+    overlaps = []
+    for group in groups.values():
+        group.sort(key=lambda lesson: (lesson.start_time, lesson.end_time))
+        latest = None
+        for lesson in group:
+            if latest is not None and lesson.start_time < latest.end_time:
+                overlaps.append((latest, lesson))
+            if latest is None or lesson.end_time > latest.end_time:
+                latest = lesson
+    return overlaps
+
+
+def validate_schedule_overlaps(schedule):
+    """
+    Проверяет, что урок не пересекается с другими уроками класса в тот же день.
+
+    Используется при сохранении урока (Schedule.clean, админка, сериализаторы),
+    поэтому при чтении расписания повторная проверка не нужна.
+    """
+    from .models import Schedule
+
+    if not schedule.classroom_id or not schedule.day_of_week or not schedule.start_time or not schedule.end_time:
+        return
+    if schedule.start_time >= schedule.end_time:
+        raise ValidationError({'end_time': 'Время окончания должно быть позже времени начала.'})
+
+    same_day = Schedule.objects.filter(
+        classroom_id=schedule.classroom_id,
+        day_of_week=schedule.day_of_week
+    ).exclude(pk=schedule.pk).select_related('subject')
+    for first, second in find_overlaps([*same_day, schedule]):
+        if schedule is first or schedule is second:
+            other = first if second is schedule else second
+            raise ValidationError(
+                f"Урок пересекается с уроком {other.subject} "
+                f"({other.start_time:%H:%M}-{other.end_time:%H:%M}) в {schedule.get_day_of_week_display()}."
+            )
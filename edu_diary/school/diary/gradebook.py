@@ -0,0 +1,103 @@
+import csv
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+
+from .models import Schedule, Grade
+
+User = get_user_model()
+
+GRADE_VALUES = (2, 3, 4, 5)
+
+
+def _average(total, count):
+    return round(total / count, 2) if count else None
+
+
+def build_gradebook(classroom, subject, date_from, date_to):
+    """
+    Журнал класса по предмету: матрица ученики × даты.
+
+    Данные загружаются тремя запросами (ученики, дни уроков, оценки), а средние
+    и распределения считаются за один проход по оценкам — пустые ячейки матрицы
+    не перебираются.
+    """
+    students = list(
+        User.objects.filter(role='student', profile__classroom=classroom)
+        .order_by('full_name', 'id')
+        .values_list('id', 'full_name')
+    )
+    lesson_days = set(
+        Schedule.objects.filter(classroom=classroom, subject=subject).values_list('day_of_week', flat=True)
+    )
+    grades = list(
+        Grade.objects.filter(
+            subject=subject,
+            student_id__in=[student_id for student_id, _ in students],
+            date__range=(date_from, date_to)
+        ).values_list('student_id', 'date', 'value')
+    )
+
+    dates = {date for _, date, _ in grades}
+    day = date_from
+    while day <= date_to:
+        if day.weekday() + 1 in lesson_days:
+            dates.add(day)
+        day += timedelta(days=1)
+    dates = sorted(dates)
+
+    row_index = {student_id: i for i, (student_id, _) in enumerate(students)}
+    column_index = {date: j for j, date in enumerate(dates)}
+    value_index = {value: k for k, value in enumerate(GRADE_VALUES)}
+
+    matrix = [[None] * len(dates) for _ in students]
+    row_totals, row_counts = [0] * len(students), [0] * len(students)
+    column_totals, column_counts = [0] * len(dates), [0] * len(dates)
+    row_distributions = [[0] * len(GRADE_VALUES) for _ in students]
+    column_distributions = [[0] * len(GRADE_VALUES) for _ in dates]
+    distribution = [0] * len(GRADE_VALUES)
+
+    for student_id, date, value in grades:
+        i, j, k = row_index[student_id], column_index[date], value_index[value]
+        matrix[i][j] = value
+        row_totals[i] += value
+        row_counts[i] += 1
+        column_totals[j] += value
+        column_counts[j] += 1
+        row_distributions[i][k] += 1
+        column_distributions[j][k] += 1
+        distribution[k] += 1
+
+    total = sum(row_totals)
+    return {
+        "subject": {"id": subject.id, "name": subject.name},
+        "classroom": {"id": classroom.id, "name": f"{classroom.number}{classroom.letter}"},
+        "grade_values": list(GRADE_VALUES),
+        "students": [{"id": student_id, "full_name": full_name} for student_id, full_name in students],
+        "dates": [date.strftime("%Y-%m-%d") for date in dates],
+        "grades": matrix,
+        "row_averages": [_average(t, c) for t, c in zip(row_totals, row_counts)],
+        "column_averages": [_average(t, c) for t, c in zip(column_totals, column_counts)],
+        "row_distributions": row_distributions,
+        "column_distributions": column_distributions,
+        "distribution": distribution,
+        "average": _average(total, len(grades)),
+    }
+
+
+class _Echo:
+    """Псевдо-буфер для csv.writer: возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def gradebook_csv_rows(gradebook):
+    """Построчно отдаёт журнал в CSV, чтобы не собирать весь файл в памяти."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(["Ученик", *gradebook["dates"], "Средний балл"])
+    for student, row, average in zip(gradebook["students"], gradebook["grades"], gradebook["row_averages"]):
+        yield writer.writerow([student["full_name"], *("" if v is None else v for v in row),
+                               "" if average is None else average])
+    yield writer.writerow(["Средний балл", *("" if v is None else v for v in gradebook["column_averages"]),
+                           "" if gradebook["average"] is None else gradebook["average"]])
@@ -1,5 +1,8 @@
+from datetime import date
+
 from django.db import models
 from django.contrib.auth import get_user_model
+from .conflicts import validate_schedule_overlaps
 
 User = get_user_model()
 
@@ -23,6 +26,18 @@ class Class(models.Model):
     def __str__(self):
         return f"{self.number}{self.letter} ({self.academic_year})"
 
+    @staticmethod
+    def current_academic_year(today=None):
+        """Учебный год в формате '2024-2025'; новый год начинается с сентября."""
+        today = today or date.today()
+        start = today.year if today.month >= 9 else today.year - 1
+        return f"{start}-{start + 1}"
+
+    @staticmethod
+    def previous_academic_year(academic_year):
+        start = int(academic_year.split('-')[0]) - 1
+        return f"{start}-{start + 1}"
+
 class Subject(models.Model):
     name = models.CharField(max_length=100, verbose_name='Название предмета')
     teacher = models.ForeignKey(
@@ -77,6 +92,16 @@ class Schedule(models.Model):
     def __str__(self):
         return f"{self.subject} ({self.classroom}) - {self.get_day_of_week_display()} {self.start_time}-{self.end_time}"
 
+    def clean(self):
+        validate_schedule_overlaps(self)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Класс на момент загрузки: при переносе урока сбрасывается кэш и старого класса
+        instance._loaded_classroom_id = instance.__dict__.get('classroom_id')
+        return instance
+
 class Grade(models.Model):
     student = models.ForeignKey(
         User,
@@ -102,6 +127,65 @@ class Grade(models.Model):
         verbose_name = 'Оценка'
         verbose_name_plural = 'Оценки'
         unique_together = ('student', 'subject', 'date')
+        indexes = [
+            models.Index(fields=['student', 'date'], name='grade_student_date_idx'),
+            models.Index(fields=['subject', 'date'], name='grade_subject_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.student.full_name}: {self.subject} - {self.value} ({self.date})"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_key = instance.aggregate_key()
+        return instance
+
+    def aggregate_key(self):
+        """Поля оценки, от которых зависит GradeAggregate."""
+        return (
+            self.__dict__.get('student_id'),
+            self.__dict__.get('subject_id'),
+            self.__dict__.get('value'),
+            self.__dict__.get('date'),
+        )
+
+
+class GradeAggregate(models.Model):
+    """Сводка оценок ученика по предмету, поддерживается инкрементально (см. aggregates.py)."""
+    student = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='grade_aggregates',
+        verbose_name='Ученик',
+        limit_choices_to={'role': 'student'}
+    )
+    subject = models.ForeignKey(
+        Subject,
+        on_delete=models.CASCADE,
+        related_name='grade_aggregates',
+        verbose_name='Предмет'
+    )
+    count = models.PositiveIntegerField(default=0, verbose_name='Количество оценок')
+    total = models.PositiveIntegerField(default=0, verbose_name='Сумма оценок')
+    count_2 = models.PositiveIntegerField(default=0, verbose_name='Количество двоек')
+    count_3 = models.PositiveIntegerField(default=0, verbose_name='Количество троек')
+    count_4 = models.PositiveIntegerField(default=0, verbose_name='Количество четвёрок')
+    count_5 = models.PositiveIntegerField(default=0, verbose_name='Количество пятёрок')
+    last_date = models.DateField(null=True, blank=True, verbose_name='Дата последней оценки')
+
+    class Meta:
+        verbose_name = 'Сводка оценок'
+        verbose_name_plural = 'Сводки оценок'
+        unique_together = ('student', 'subject')
+
+    def __str__(self):
+        return f"{self.student_id}: {self.subject_id} - {self.average}"
+
+    @property
+    def average(self):
+        return round(self.total / self.count, 2) if self.count else None
+
+    @property
+    def distribution(self):
+        return {str(value): getattr(self, f'count_{value}') for value in (2, 3, 4, 5)}
@@ -0,0 +1,28 @@
+from django.db import transaction
+
+from users.models import Profile
+from .models import Class
+
+
+def rollover_profiles(from_year, to_year):
+    """
+    Переводит учеников из классов учебного года from_year в классы года to_year
+    с номером на единицу больше и той же буквой (7Б 2024-2025 → 8Б 2025-2026).
+
+    Классы нового года создаются заранее. Профили класса, для которого пары нет
+    (выпускной класс или ещё не созданный), остаются в старом классе.
+    Возвращает (число переведённых профилей, список классов без пары).
+    """
+    targets = {
+        (classroom.number, classroom.letter): classroom
+        for classroom in Class.objects.filter(academic_year=to_year)
+    }
+    moved, missing = 0, []
+    with transaction.atomic():
+        for classroom in Class.objects.filter(academic_year=from_year, profiles__isnull=False).distinct():
+            target = targets.get((classroom.number + 1, classroom.letter))
+            if target is None:
+                missing.append(classroom)
+                continue
+            moved += Profile.objects.filter(classroom=classroom).update(classroom=target)
+    return moved, sorted(missing, key=lambda classroom: (classroom.number, classroom.letter))
@@ -0,0 +1,83 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.core.cache import cache
+
+from school.cache import get_versions
+from .models import Grade
+from .serializers import LessonSerializer
+
+DAYS = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"]
+
+TIMETABLE_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+
+
+def fetch_week_lessons(queryset):
+    """Все уроки недели одним запросом, вместе с предметом и классом."""
+    return list(
+        queryset.select_related('subject', 'classroom').order_by('day_of_week', 'start_time')
+    )
+
+
+def fetch_week_grades(student, start_date, end_date):
+    """Оценки ученика за неделю одним запросом: {(subject_id, date): value}."""
+    if student is None:
+        return {}
+    rows = Grade.objects.filter(
+        student=student,
+        date__range=(start_date, end_date)
+    ).values_list('subject_id', 'date', 'value')
+    return {(subject_id, date): value for subject_id, date, value in rows}
+
+
+def build_skeleton(lessons, start_date):
+    """Собирает расписание на семь дней в памяти, без оценок и без дополнительных запросов."""
+    lessons_by_day = defaultdict(list)
+    for lesson in lessons:
+        lessons_by_day[lesson.day_of_week].append(lesson)
+
+    result = []
+    current_date = start_date
+    for _ in range(7):
+        day_index = current_date.weekday()
+        lessons_serializer = LessonSerializer(lessons_by_day[day_index + 1], many=True)
+        result.append({
+            "day": DAYS[day_index],
+            "date": str(current_date.day),
+            "lessons": lessons_serializer.data
+        })
+        current_date += timedelta(days=1)
+    return result
+
+
+def overlay_grades(skeleton, start_date, grades):
+    """Подставляет оценки ученика в готовый скелет расписания, не изменяя его."""
+    result = []
+    for offset, day in enumerate(skeleton):
+        current_date = start_date + timedelta(days=offset)
+        lessons = [
+            {**lesson, 'grade': grades.get((lesson['subject_id'], current_date))}
+            for lesson in day['lessons']
+        ]
+        result.append({**day, 'lessons': lessons})
+    return result
+
+
+def timetable_version_name(classroom_id):
+    return f'diary:timetable:{classroom_id}'
+
+
+def get_class_skeleton(classroom_id, start_date, queryset):
+    """
+    Скелет расписания класса на неделю из кэша.
+
+    Ключ включает класс, неделю и версии, которые сбрасываются сигналами
+    при изменении Schedule и Subject (см. diary/signals.py).
+    """
+    versions = get_versions('diary:timetable', timetable_version_name(classroom_id))
+    key = 'diary:timetable:{}:{:%Y-%m-%d}:{}:{}'.format(classroom_id, start_date, *versions)
+    skeleton = cache.get(key)
+    if skeleton is None:
+        skeleton = build_skeleton(fetch_week_lessons(queryset), start_date)
+        cache.set(key, skeleton, TIMETABLE_CACHE_TIMEOUT)
+    return skeleton
@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import Schedule, Grade, Subject
+from drf_spectacular.utils import extend_schema_field
+from .models import Schedule, Grade, GradeAggregate, Subject
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -10,7 +11,49 @@ class GradeSerializer(serializers.ModelSerializer):
         fields = ['id', 'value', 'date', 'comment']
         read_only_fields = ['id', 'date']
 
+class GradeAggregateSerializer(serializers.ModelSerializer):
+    subject = serializers.CharField(source='subject.name')
+    average = serializers.FloatField(read_only=True)
+    distribution = serializers.DictField(child=serializers.IntegerField(), read_only=True)
+
+    class Meta:
+        model = GradeAggregate
+        fields = ['subject_id', 'subject', 'count', 'average', 'distribution', 'last_date']
+
+
+class GradeBulkItemSerializer(serializers.Serializer):
+    student = serializers.IntegerField()
+    value = serializers.ChoiceField(choices=[2, 3, 4, 5])
+    comment = serializers.CharField(required=False, allow_blank=True, allow_null=True, default='')
+
+
+class GradeBulkSerializer(serializers.Serializer):
+    subject = serializers.IntegerField()
+    date = serializers.DateField()
+    # Строки проверяются по отдельности, чтобы ошибка в одной не отклоняла весь класс
+    grades = serializers.ListField(child=serializers.DictField(), allow_empty=False)
+
+
+class GradebookPeriodSerializer(serializers.Serializer):
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+
+
+class GradeBulkResultSerializer(serializers.Serializer):
+    student = serializers.JSONField()
+    status = serializers.ChoiceField(choices=['created', 'updated', 'error'])
+    value = serializers.IntegerField(required=False)
+    errors = serializers.DictField(required=False)
+
+
+class GradeBulkResponseSerializer(serializers.Serializer):
+    subject = serializers.IntegerField()
+    date = serializers.DateField()
+    results = GradeBulkResultSerializer(many=True)
+
+
 class LessonSerializer(serializers.ModelSerializer):
+    subject_id = serializers.IntegerField(read_only=True)
     subject = serializers.CharField(source='subject.name')
     start_time = serializers.SerializerMethodField()
     end_time = serializers.SerializerMethodField()
@@ -18,7 +61,7 @@ class LessonSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Schedule
-        fields = ['subject', 'start_time', 'end_time', 'grade']
+        fields = ['subject_id', 'subject', 'start_time', 'end_time', 'grade']
 
     def get_start_time(self, obj):
         return obj.start_time.strftime("%H:%M")
@@ -26,31 +69,9 @@ class LessonSerializer(serializers.ModelSerializer):
     def get_end_time(self, obj):
         return obj.end_time.strftime("%H:%M")
 
+    @extend_schema_field(serializers.IntegerField(allow_null=True))
     def get_grade(self, obj):
-        user = self.context['request'].user
-        date = self.context.get('date')
-        student_id = self.context.get('student_id')  # Получаем student_id из контекста
-        student = None
-
-        if user.role == 'student':
-            student = user
-        elif user.role == 'parent':
-            student_parent = user.parent_students.first()
-            student = student_parent.student if student_parent else None
-        elif user.role == 'teacher':
-            if student_id:
-                student = User.objects.filter(id=student_id, role='student').first()
-            else:
-                # Если student_id не указан, возвращаем None (или можно показать оценки всех учеников)
-                return None
-
-        if student and date:
-            grade = Grade.objects.filter(
-                student=student,
-                subject=obj.subject,
-                date=date
-            ).first()
-            return grade.value if grade else None
+        # В скелете расписания оценки нет: её подставляет schedule.overlay_grades
         return None
 
 
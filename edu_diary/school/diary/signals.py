@@ -0,0 +1,32 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from school.cache import bump_version
+from .aggregates import apply_grade_deltas, grade_deltas
+from .models import Subject, Schedule, Grade
+from .schedule import timetable_version_name
+
+
+@receiver([post_save, post_delete], sender=Schedule)
+def invalidate_class_timetable(sender, instance, **kwargs):
+    classroom_ids = {instance.classroom_id, getattr(instance, '_loaded_classroom_id', None)}
+    for classroom_id in classroom_ids - {None}:
+        bump_version(timetable_version_name(classroom_id))
+    instance._loaded_classroom_id = instance.classroom_id
+
+
+@receiver([post_save, post_delete], sender=Subject)
+def invalidate_all_timetables(sender, instance, **kwargs):
+    bump_version('diary:timetable')
+
+
+@receiver(post_save, sender=Grade)
+def update_grade_aggregate_on_save(sender, instance, **kwargs):
+    new_key = instance.aggregate_key()
+    apply_grade_deltas(grade_deltas(getattr(instance, '_loaded_key', None), new_key))
+    instance._loaded_key = new_key
+
+
+@receiver(post_delete, sender=Grade)
+def update_grade_aggregate_on_delete(sender, instance, **kwargs):
+    apply_grade_deltas(grade_deltas(getattr(instance, '_loaded_key', instance.aggregate_key()), None))
@@ -1,9 +1,12 @@
 from django.urls import path
-from .views import ScheduleView, GradeCreateUpdateView
+from .views import ScheduleView, GradeCreateUpdateView, GradeBulkCreateView, GradeSummaryView, GradebookView
 
 app_name = 'diary'
 
 urlpatterns = [
     path('schedule/', ScheduleView.as_view(), name='schedule'),
     path('grades/', GradeCreateUpdateView.as_view(), name='grades'),
+    path('grades/bulk/', GradeBulkCreateView.as_view(), name='grades-bulk'),
+    path('grades/summary/', GradeSummaryView.as_view(), name='grades-summary'),
+    path('gradebook/', GradebookView.as_view(), name='gradebook'),
 ]
@@ -1,16 +1,27 @@
+import logging
+
 from rest_framework import generics, status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from drf_spectacular.utils import extend_schema, OpenApiResponse, OpenApiParameter
 from datetime import datetime, timedelta
+from django.http import StreamingHttpResponse
 from django.utils.dateparse import parse_date
 from django.contrib.auth import get_user_model
-from .models import Schedule, Grade, Class, Subject
-from .serializers import ScheduleSerializer, GradeSerializer, LessonSerializer  # Добавили LessonSerializer
+from django.db import transaction
+from .models import Schedule, Grade, GradeAggregate, Class, Subject
+from .serializers import (
+    ScheduleSerializer, GradeSerializer, GradeBulkSerializer, GradeBulkItemSerializer, GradeBulkResponseSerializer,
+    GradeAggregateSerializer, GradebookPeriodSerializer
+)
+from .aggregates import apply_grade_deltas, grade_deltas
+from .gradebook import build_gradebook, gradebook_csv_rows
+from .schedule import fetch_week_lessons, fetch_week_grades, build_skeleton, overlay_grades, get_class_skeleton
 from users.permissions import IsTeacher
 from users.custom_auth import CsrfExemptSessionAuthentication
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
 
 
 class ScheduleView(generics.GenericAPIView):
@@ -18,56 +29,46 @@ class ScheduleView(generics.GenericAPIView):
     permission_classes = [IsAuthenticated]
     authentication_classes = [CsrfExemptSessionAuthentication]
 
-    def get_queryset(self):
-        user = self.request.user
-        print(f"User: {user}, Role: {user.role}")
+    def get_student(self):
+        """Ученик, чьи оценки показываются в расписании. Определяется один раз за запрос."""
+        if hasattr(self, '_student'):
+            return self._student
 
+        user = self.request.user
+        student = None
         if user.role == 'student':
-            profile = user.profile
-            print(f"Student Profile: class_number={profile.class_number}, class_letter={profile.class_letter}")
-            # Вместо поиска Class, напрямую фильтруем Schedule по данным из Profile
-            if profile.class_number and profile.class_letter:
-                return Schedule.objects.filter(
-                    classroom__number=profile.class_number,
-                    classroom__letter=profile.class_letter
-                )
-            return Schedule.objects.none()
-
+            student = user
         elif user.role == 'parent':
-            student_parent = user.parent_students.first()
-            print(f"Parent Student: {student_parent}")
-            if not student_parent:
+            student_parent = user.parent_students.select_related('student__profile').first()
+            student = student_parent.student if student_parent else None
+        elif user.role == 'teacher':
+            student_id = self.request.query_params.get('student_id')
+            if student_id:
+                student = User.objects.filter(id=student_id, role='student').first()
+
+        self._student = student
+        return student
+
+    def get_queryset(self):
+        user = self.request.user
+        logger.debug("schedule queryset user=%s role=%s", user.pk, user.role)
+
+        if user.role in ('student', 'parent'):
+            student = self.get_student()
+            if not student:
                 return Schedule.objects.none()
-            student = student_parent.student
             profile = student.profile
-            print(f"Parent's Student Profile: class_number={profile.class_number}, class_letter={profile.class_letter}")
-            if profile.class_number and profile.class_letter:
-                return Schedule.objects.filter(
-                    classroom__number=profile.class_number,
-                    classroom__letter=profile.class_letter
-                )
+            logger.debug("schedule student=%s classroom=%s", student.pk, profile.classroom_id)
+            if profile.classroom_id:
+                return Schedule.objects.filter(classroom_id=profile.classroom_id)
             return Schedule.objects.none()
 
         elif user.role == 'teacher':
             subjects = Subject.objects.filter(teacher=user)
-            print(f"Teacher Subjects: {subjects}")
             return Schedule.objects.filter(subject__in=subjects)
 
         return Schedule.objects.none()
 
-    def validate_overlapping_lessons(self, queryset, start_date, end_date):
-        for schedule in queryset:
-            overlapping = Schedule.objects.filter(
-                classroom=schedule.classroom,
-                day_of_week=schedule.day_of_week,
-                start_time__lt=schedule.end_time,
-                end_time__gt=schedule.start_time
-            ).exclude(id=schedule.id)
-            if overlapping.exists():
-                raise serializers.ValidationError(
-                    f"Урок {schedule.subject} пересекается с другим уроком в {schedule.get_day_of_week_display()}."
-                )
-
     @extend_schema(
         tags=["Дневник"],
         summary="Получение расписания на неделю",
@@ -90,7 +91,6 @@ class ScheduleView(generics.GenericAPIView):
     def get(self, request, *args, **kwargs):
         start_date_str = request.query_params.get('start_date')
         direction = request.query_params.get('direction')
-        student_id = request.query_params.get('student_id')
 
         if start_date_str:
             start_date = parse_date(start_date_str)
@@ -116,34 +116,18 @@ class ScheduleView(generics.GenericAPIView):
 
         end_date = start_date + timedelta(days=6)
 
-        queryset = self.get_queryset().filter(
-            day_of_week__range=[start_date.weekday() + 1, end_date.weekday() + 1]
-        )
+        # Семь дней подряд покрывают все дни недели, поэтому фильтр по day_of_week не нужен.
+        # Пересечения уроков проверяются при сохранении (Schedule.clean), а не при чтении
+        student = self.get_student()
+        profile = student.profile if student and request.user.role != 'teacher' else None
+        if profile and profile.classroom_id:
+            # Расписание класса общее для всех учеников, кэшируем его без оценок
+            skeleton = get_class_skeleton(profile.classroom_id, start_date, self.get_queryset())
+        else:
+            skeleton = build_skeleton(fetch_week_lessons(self.get_queryset()), start_date)
 
-        try:
-            self.validate_overlapping_lessons(queryset, start_date, end_date)
-        except serializers.ValidationError as e:
-            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
-
-        days = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"]
-        result = []
-
-        current_date = start_date
-        for i in range(7):
-            day_index = current_date.weekday()
-            day_name = days[day_index]
-            day_schedules = queryset.filter(day_of_week=day_index + 1)
-            lessons_serializer = LessonSerializer(
-                day_schedules,
-                many=True,
-                context={'request': request, 'date': current_date, 'student_id': student_id}
-            )
-            result.append({
-                "day": day_name,
-                "date": str(current_date.day),
-                "lessons": lessons_serializer.data
-            })
-            current_date += timedelta(days=1)
+        grades = fetch_week_grades(student, start_date, end_date)
+        result = overlay_grades(skeleton, start_date, grades)
 
         months = [
             "Январь", "Февраль", "Март", "Апрель", "Май", "Июнь",
@@ -213,26 +197,243 @@ class GradeCreateUpdateView(generics.GenericAPIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        student = User.objects.filter(id=student_id, role='student').first()
-        subject = Subject.objects.filter(id=subject_id, teacher=request.user).first()
+        with transaction.atomic():
+            student = User.objects.filter(id=student_id, role='student').first()
+            # Блокировка предмета упорядочивает запись оценок по нему с массовым выставлением
+            subject = Subject.objects.select_for_update().filter(id=subject_id, teacher=request.user).first()
+
+            if not student or not subject:
+                return Response(
+                    {"detail": "Ученик или предмет не найдены, или вы не преподаете этот предмет"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            grade, created = Grade.objects.select_for_update().get_or_create(
+                student=student,
+                subject=subject,
+                date=date,
+                defaults={'value': value, 'comment': request.data.get('comment', '')}
+            )
+
+            if not created:
+                serializer = self.get_serializer(grade, data=request.data, partial=True)
+                serializer.is_valid(raise_exception=True)
+                serializer.save()
+                return Response(serializer.data, status=status.HTTP_200_OK)
+
+        return Response(self.get_serializer(grade).data, status=status.HTTP_201_CREATED)
+
+class GradeBulkCreateView(generics.GenericAPIView):
+    serializer_class = GradeBulkSerializer
+    permission_classes = [IsAuthenticated, IsTeacher]
+    authentication_classes = [CsrfExemptSessionAuthentication]
+
+    @extend_schema(
+        tags=["Дневник"],
+        summary="Массовое выставление оценок",
+        description="Выставляет или обновляет оценки сразу нескольким ученикам по одному предмету за одну дату. "
+                    "Возвращает результат по каждой строке. Доступно только учителям.",
+        responses={
+            200: OpenApiResponse(response=GradeBulkResponseSerializer, description="Результаты по строкам"),
+            400: OpenApiResponse(description="Некорректные данные"),
+            403: OpenApiResponse(description="Доступ запрещен"),
+        }
+    )
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        date = serializer.validated_data['date']
+
+        rows = []
+        for item in serializer.validated_data['grades']:
+            row = GradeBulkItemSerializer(data=item)
+            rows.append((item, row, row.is_valid()))
+
+        with transaction.atomic():
+            # Блокировка предмета не даёт параллельной записи по нему создать оценку между
+            # чтением existing и upsert: иначе статусы created/updated и старые значения
+            # для сводок были бы неверны. Существующие оценки блокируются отдельно.
+            subject = Subject.objects.select_for_update().filter(
+                id=serializer.validated_data['subject'], teacher=request.user
+            ).first()
+            if not subject:
+                return Response(
+                    {"detail": "Предмет не найден, или вы не преподаете этот предмет"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            student_ids = {row.validated_data['student'] for _, row, valid in rows if valid}
+            students = set(User.objects.filter(id__in=student_ids, role='student').values_list('id', flat=True))
+            existing = dict(Grade.objects.select_for_update().filter(
+                subject=subject, date=date, student_id__in=students
+            ).values_list('student_id', 'value'))
+
+            results = []
+            grades = []
+            deltas = []
+            seen = set()
+            for item, row, valid in rows:
+                if not valid:
+                    results.append({"student": item.get('student'), "status": "error", "errors": row.errors})
+                    continue
+                student_id = row.validated_data['student']
+                if student_id not in students:
+                    results.append({"student": student_id, "status": "error",
+                                    "errors": {"student": ["Ученик не найден."]}})
+                    continue
+                if student_id in seen:
+                    results.append({"student": student_id, "status": "error",
+                                    "errors": {"student": ["Ученик указан в запросе несколько раз."]}})
+                    continue
+                seen.add(student_id)
+                grades.append(Grade(
+                    student_id=student_id,
+                    subject=subject,
+                    date=date,
+                    value=row.validated_data['value'],
+                    comment=row.validated_data.get('comment') or '',
+                ))
+                old_value = existing.get(student_id)
+                deltas += grade_deltas(
+                    (student_id, subject.id, old_value, date) if old_value else None,
+                    (student_id, subject.id, row.validated_data['value'], date),
+                )
+                results.append({
+                    "student": student_id,
+                    "status": "updated" if student_id in existing else "created",
+                    "value": row.validated_data['value'],
+                })
+
+            Grade.objects.bulk_create(
+                grades,
+                update_conflicts=True,
+                unique_fields=['student', 'subject', 'date'],
+                update_fields=['value', 'comment'],
+            )
+            # bulk_create не отправляет сигналы, поэтому сводки обновляем явно
+            apply_grade_deltas(deltas)
+
+        return Response({
+            "subject": subject.id,
+            "date": date.strftime("%Y-%m-%d"),
+            "results": results,
+        }, status=status.HTTP_200_OK)
 
-        if not student or not subject:
+
+class GradeSummaryView(generics.ListAPIView):
+    serializer_class = GradeAggregateSerializer
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [CsrfExemptSessionAuthentication]
+
+    def get_student_id(self):
+        user = self.request.user
+        student_id = self.request.query_params.get('student_id')
+        if student_id and not student_id.isdigit():
+            return None
+        if user.role == 'student':
+            return user.id
+        if user.role == 'parent':
+            links = user.parent_students.all()
+            if student_id:
+                links = links.filter(student_id=student_id)
+            link = links.first()
+            return link.student_id if link else None
+        if user.role == 'teacher' and student_id:
+            return student_id
+        return None
+
+    def get_queryset(self):
+        student_id = self.get_student_id()
+        if student_id is None:
+            return GradeAggregate.objects.none()
+        queryset = GradeAggregate.objects.filter(student_id=student_id, count__gt=0)
+        if self.request.user.role == 'teacher':
+            # Как и в расписании, учитель видит оценки только по своим предметам
+            queryset = queryset.filter(subject__teacher=self.request.user)
+        return queryset.select_related('subject').order_by('subject__name')
+
+    @extend_schema(
+        tags=["Дневник"],
+        summary="Сводка оценок по предметам",
+        description="Возвращает количество оценок, средний балл, распределение оценок и дату последней оценки "
+                    "по каждому предмету. Ученик видит свои оценки, родитель — оценки ребёнка, "
+                    "учитель — оценки ученика из student_id по своим предметам.",
+        parameters=[
+            OpenApiParameter(name='student_id', description='ID ученика (для родителей и учителей)', type=int,
+                             required=False),
+        ],
+        responses={
+            200: OpenApiResponse(response=GradeAggregateSerializer(many=True), description="Сводка оценок"),
+            401: OpenApiResponse(description="Неавторизован"),
+        }
+    )
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+
+class GradebookView(generics.GenericAPIView):
+    permission_classes = [IsAuthenticated, IsTeacher]
+    authentication_classes = [CsrfExemptSessionAuthentication]
+    max_days = 366
+
+    @extend_schema(
+        tags=["Дневник"],
+        summary="Журнал класса по предмету",
+        description="Возвращает матрицу оценок ученики × даты по предмету для класса за период, "
+                    "средние по строкам и столбцам и распределение оценок. "
+                    "С параметром output=csv журнал отдаётся CSV-файлом. Доступно только учителю предмета.",
+        parameters=[
+            OpenApiParameter(name='subject', description='ID предмета', type=int, required=True),
+            OpenApiParameter(name='classroom', description='ID класса', type=int, required=True),
+            OpenApiParameter(name='date_from', description='Начало периода (ГГГГ-ММ-ДД), по умолчанию 30 дней назад',
+                             type=str, required=False),
+            OpenApiParameter(name='date_to', description='Конец периода (ГГГГ-ММ-ДД), по умолчанию сегодня',
+                             type=str, required=False),
+            OpenApiParameter(name='output', description='Формат ответа: json (по умолчанию) или csv', type=str,
+                             required=False),
+        ],
+        responses={
+            200: OpenApiResponse(description="Журнал"),
+            400: OpenApiResponse(description="Некорректные параметры"),
+            403: OpenApiResponse(description="Доступ запрещен"),
+        }
+    )
+    def get(self, request, *args, **kwargs):
+        subject_id = request.query_params.get('subject')
+        classroom_id = request.query_params.get('classroom')
+        if not (subject_id and subject_id.isdigit() and classroom_id and classroom_id.isdigit()):
             return Response(
-                {"detail": "Ученик или предмет не найдены, или вы не преподаете этот предмет"},
+                {"detail": "Не указаны subject или classroom"},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        grade, created = Grade.objects.get_or_create(
-            student=student,
-            subject=subject,
-            date=date,
-            defaults={'value': value, 'comment': request.data.get('comment', '')}
-        )
+        period = GradebookPeriodSerializer(data=request.query_params)
+        if not period.is_valid():
+            return Response(
+                {"detail": "Некорректный формат даты. Используйте ГГГГ-ММ-ДД"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        date_to = period.validated_data.get('date_to') or datetime.today().date()
+        date_from = period.validated_data.get('date_from') or date_to - timedelta(days=30)
+        if date_from > date_to or (date_to - date_from).days > self.max_days:
+            return Response(
+                {"detail": f"Период должен быть не длиннее {self.max_days} дней и начинаться не позже конца"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        subject = Subject.objects.filter(id=subject_id, teacher=request.user).first()
+        classroom = Class.objects.filter(id=classroom_id).first()
+        if not subject or not classroom:
+            return Response(
+                {"detail": "Класс или предмет не найдены, или вы не преподаете этот предмет"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-        if not created:
-            serializer = self.get_serializer(grade, data=request.data, partial=True)
-            serializer.is_valid(raise_exception=True)
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_200_OK)
+        gradebook = build_gradebook(classroom, subject, date_from, date_to)
 
-        return Response(self.get_serializer(grade).data, status=status.HTTP_201_CREATED)
\ No newline at end of file
+        if request.query_params.get('output') == 'csv':
+            response = StreamingHttpResponse(gradebook_csv_rows(gradebook), content_type='text/csv; charset=utf-8')
+            filename = f"gradebook_{classroom.number}{classroom.letter}_{subject.id}_{date_from}_{date_to}.csv"
+            response['Content-Disposition'] = f'attachment; filename="{filename}"'
+            return response
+        return Response(gradebook)
@@ -2,6 +2,8 @@ from django.conf import settings
 
 from django.db import models
 from django.contrib.auth import get_user_model
+
+from edu_diary.images import VariantImageField
 from .choices import (
     ProjectStatusEnum,
     TaskStatusEnum,
@@ -34,7 +36,10 @@ class Project(models.Model):
         choices=ProjectPriorityEnum.choices,
         default=ProjectPriorityEnum.MEDIUM
     )
-    avatar = models.ImageField("Аватар проекта", upload_to='project_avatars/', null=True, blank=True)
+    avatar = VariantImageField(
+        "Аватар проекта", upload_to='project_avatars/', null=True, blank=True, variants_field='avatar_variants_ready'
+    )
+    avatar_variants_ready = models.BooleanField("Варианты аватара готовы", default=False, editable=False)
 
     def save(self, *args, **kwargs):
         if not self.project_code:
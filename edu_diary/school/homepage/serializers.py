@@ -3,14 +3,17 @@ from rest_framework import serializers
 from .models import Event, Project, ProjectMember, ProjectTask, StudentEvent
 
 from users.models import User
+from edu_diary.images import ImageVariantsField
 
 class StudentSerializer(serializers.ModelSerializer):
-    class_number = serializers.IntegerField(source='profile.class_number', read_only=True)
-    class_letter = serializers.CharField(source='profile.class_letter', read_only=True)
+    classroom = serializers.IntegerField(source='profile.classroom_id', read_only=True)
+    class_number = serializers.IntegerField(source='profile.classroom.number', read_only=True, default=None)
+    class_letter = serializers.CharField(source='profile.classroom.letter', read_only=True, default=None)
+    avatar_variants = ImageVariantsField(source='avatar')
 
     class Meta:
         model = User
-        fields = [ 'full_name', 'avatar', 'class_number', 'class_letter' ]
+        fields = [ 'full_name', 'avatar', 'avatar_variants', 'classroom', 'class_number', 'class_letter' ]
 
 
 class EventSerializer(serializers.ModelSerializer):
@@ -34,9 +37,10 @@ class ProjectSerializer(serializers.ModelSerializer):
     all_tasks = ProjectTaskSerializer(many=True, read_only=True)
     active_tasks = ProjectTaskSerializer(many=True, read_only=True)
     members = ProjectMemberSerializer(many=True, read_only=True)
+    avatar_variants = ImageVariantsField(source='avatar')
     class Meta:
         model = Project
-        fields = 'project_code title start_date priority avatar all_tasks active_tasks members'.split()
+        fields = 'project_code title start_date priority avatar avatar_variants all_tasks active_tasks members'.split()
 
 
 
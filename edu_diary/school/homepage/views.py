@@ -29,7 +29,7 @@ class MyChildrenListView(generics.ListAPIView):
         return User.objects.filter(
             role='student',
             student_parents__parent=user
-        ).distinct()
+        ).select_related('profile__classroom').distinct()
 
 
 @extend_schema(
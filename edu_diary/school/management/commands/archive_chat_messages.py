@@ -0,0 +1,25 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from school.chat.archive import archive_messages
+
+
+class Command(BaseCommand):
+    help = (
+        "Переносит сообщения чатов старше заданного возраста в архивную таблицу. "
+        "История чата продолжает читать их через те же курсоры. Рассчитана на запуск по расписанию (cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.CHAT_ARCHIVE_AFTER_DAYS,
+                            help='Возраст сообщений в днях (по умолчанию CHAT_ARCHIVE_AFTER_DAYS)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Сообщений в одной транзакции')
+
+    def handle(self, *args, **options):
+        older_than = timezone.now() - timedelta(days=options['days'])
+        moved = archive_messages(older_than, options['batch_size'])
+        total = sum(moved.values())
+        self.stdout.write(f"Перенесено сообщений: {total} из {len([count for count in moved.values() if count])} чатов")
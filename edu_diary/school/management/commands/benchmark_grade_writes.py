@@ -0,0 +1,88 @@
+import threading
+import time
+import uuid
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test import Client
+
+from school.diary.models import Subject
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Замеряет пропускную способность записи оценок при параллельных запросах "
+        "к diary/grades/ на текущей базе данных. Создаёт временных пользователей и удаляет их после замера."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='Количество параллельных клиентов')
+        parser.add_argument('--requests', type=int, default=50, help='Запросов на одного клиента')
+
+    def handle(self, *args, **options):
+        threads, per_thread = options['threads'], options['requests']
+        tag = uuid.uuid4().hex[:8]
+
+        teacher = User.objects.create(
+            email=f'bench-teacher-{tag}@example.com', username=f'bench-teacher-{tag}',
+            full_name='Benchmark', role='teacher'
+        )
+        subject = Subject.objects.create(name=f'Benchmark {tag}', teacher=teacher)
+        students = User.objects.bulk_create([
+            User(email=f'bench-{tag}-{n}@example.com', username=f'bench-{tag}-{n}',
+                 full_name=f'Benchmark {n}', role='student')
+            for n in range(threads)
+        ])
+
+        errors = []
+        latencies = []
+        lock = threading.Lock()
+
+        def worker(student):
+            client = Client()
+            client.force_login(teacher)
+            try:
+                for n in range(per_thread):
+                    started = time.perf_counter()
+                    response = client.post('/api/school/diary/grades/', {
+                        'student': student.id,
+                        'subject': subject.id,
+                        'date': str(date(2025, 1, 1) + timedelta(days=n % 200)),
+                        'value': 2 + n % 4,
+                    })
+                    with lock:
+                        latencies.append(time.perf_counter() - started)
+                        if response.status_code not in (200, 201):
+                            errors.append(response.status_code)
+            except Exception as exc:
+                with lock:
+                    errors.append(repr(exc))
+            finally:
+                connections.close_all()
+
+        pool = [threading.Thread(target=worker, args=(student,)) for student in students]
+        started = time.perf_counter()
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        User.objects.filter(pk__in=[teacher.pk, *(student.pk for student in students)]).delete()
+
+        latencies.sort()
+        total = len(latencies)
+        self.stdout.write(f"База данных: {connection.vendor} ({connection.settings_dict['NAME']})")
+        self.stdout.write(f"Клиентов: {threads}, запросов: {total}, ошибок: {len(errors)}")
+        self.stdout.write(f"Пропускная способность: {total / elapsed:.1f} запросов/с")
+        if total:
+            self.stdout.write(
+                f"Задержка p50: {latencies[total // 2] * 1000:.1f} мс, "
+                f"p95: {latencies[int(total * 0.95) - 1] * 1000:.1f} мс"
+            )
+        if errors:
+            self.stdout.write(self.style.WARNING(f"Первые ошибки: {errors[:5]}"))
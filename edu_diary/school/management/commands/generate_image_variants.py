@@ -0,0 +1,30 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from edu_diary.images import VariantImageField, process_image, strip_stored_metadata
+
+
+class Command(BaseCommand):
+    help = (
+        "Готовит варианты thumb/card/full для уже загруженных изображений всех полей VariantImageField "
+        "и убирает метаданные из файлов, загруженных до его появления. Нужна после переноса старых "
+        "файлов или если фоновая обработка прервалась вместе с процессом."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Пересоздать и уже готовые варианты')
+
+    def handle(self, *args, **options):
+        processed = 0
+        for model in apps.get_models():
+            for field in model._meta.fields:
+                if not isinstance(field, VariantImageField):
+                    continue
+                rows = model._default_manager.exclude(**{field.name: ''}).exclude(**{f'{field.name}__isnull': True})
+                if not options['force'] and field.variants_field:
+                    rows = rows.filter(**{field.variants_field: False})
+                for name in rows.values_list(field.name, flat=True).distinct().iterator():
+                    strip_stored_metadata(field.storage, name)
+                    process_image(model, field.name, name)
+                    processed += 1
+        self.stdout.write(f"Обработано изображений: {processed}")
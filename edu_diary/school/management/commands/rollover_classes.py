@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from school.diary.models import Class
+from school.diary.rollover import rollover_profiles
+
+
+class Command(BaseCommand):
+    help = (
+        "Переводит учеников в классы нового учебного года: из класса N<буква> прошлого года "
+        "в класс N+1<буква> текущего. Классы нового года нужно создать заранее."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--to-year', default=None,
+                            help='Учебный год, в который переводятся ученики (по умолчанию текущий)')
+
+    def handle(self, *args, **options):
+        to_year = options['to_year'] or Class.current_academic_year()
+        from_year = Class.previous_academic_year(to_year)
+        moved, missing = rollover_profiles(from_year, to_year)
+        self.stdout.write(f"Переведено учеников: {moved} ({from_year} → {to_year})")
+        if missing:
+            names = ', '.join(f"{classroom.number}{classroom.letter}" for classroom in missing)
+            self.stdout.write(f"Нет класса в новом году для: {names}")
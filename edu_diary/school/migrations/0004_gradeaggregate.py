@@ -0,0 +1,53 @@
+# Generated by Django 5.2 on 2026-10-18 07:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_grade_aggregates(apps, schema_editor):
+    Grade = apps.get_model('school', 'Grade')
+    GradeAggregate = apps.get_model('school', 'GradeAggregate')
+
+    rows = Grade.objects.values('student_id', 'subject_id').annotate(
+        count=models.Count('id'),
+        total=models.Sum('value'),
+        count_2=models.Count('id', filter=models.Q(value=2)),
+        count_3=models.Count('id', filter=models.Q(value=3)),
+        count_4=models.Count('id', filter=models.Q(value=4)),
+        count_5=models.Count('id', filter=models.Q(value=5)),
+        last_date=models.Max('date'),
+    ).order_by()
+    GradeAggregate.objects.bulk_create(GradeAggregate(**row) for row in rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('school', '0003_achievementcategory_achievementplace_achievement'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GradeAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Количество оценок')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Сумма оценок')),
+                ('count_2', models.PositiveIntegerField(default=0, verbose_name='Количество двоек')),
+                ('count_3', models.PositiveIntegerField(default=0, verbose_name='Количество троек')),
+                ('count_4', models.PositiveIntegerField(default=0, verbose_name='Количество четвёрок')),
+                ('count_5', models.PositiveIntegerField(default=0, verbose_name='Количество пятёрок')),
+                ('last_date', models.DateField(blank=True, null=True, verbose_name='Дата последней оценки')),
+                ('student', models.ForeignKey(limit_choices_to={'role': 'student'}, on_delete=django.db.models.deletion.CASCADE, related_name='grade_aggregates', to=settings.AUTH_USER_MODEL, verbose_name='Ученик')),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='grade_aggregates', to='school.subject', verbose_name='Предмет')),
+            ],
+            options={
+                'verbose_name': 'Сводка оценок',
+                'verbose_name_plural': 'Сводки оценок',
+                'unique_together': {('student', 'subject')},
+            },
+        ),
+        migrations.RunPython(backfill_grade_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2 on 2026-10-18 08:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_last_message(apps, schema_editor):
+    Chat = apps.get_model('school', 'Chat')
+    ChatMessage = apps.get_model('school', 'ChatMessage')
+
+    last_ids = Chat.objects.annotate(
+        last_id=models.Subquery(
+            ChatMessage.objects.filter(chat=models.OuterRef('pk')).order_by('-created_at', '-id').values('pk')[:1]
+        )
+    ).filter(last_id__isnull=False).values_list('last_id', flat=True)
+    chats = []
+    for message in ChatMessage.objects.filter(pk__in=list(last_ids)).iterator():
+        chats.append(Chat(
+            pk=message.chat_id,
+            last_message_id=message.pk,
+            last_message_sender_id=message.sender_id,
+            last_message_preview=message.message_content[:100],
+            last_message_at=message.created_at,
+        ))
+    Chat.objects.bulk_update(
+        chats, ['last_message', 'last_message_sender', 'last_message_preview', 'last_message_at'], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('school', '0005_hot_path_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chat',
+            name='last_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='school.chatmessage'),
+        ),
+        migrations.AddField(
+            model_name='chat',
+            name='last_message_preview',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='chat',
+            name='last_message_sender',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(backfill_last_message, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2 on 2026-10-18 08:09
+
+from django.db import migrations, models
+
+
+def read_by_to_watermarks(apps, schema_editor):
+    """Отметка участника — самое позднее прочитанное им сообщение чата; непрочитанные пересчитываются от неё."""
+    ChatMessage = apps.get_model('school', 'ChatMessage')
+    ChatParticipant = apps.get_model('school', 'ChatParticipant')
+    ReadBy = ChatMessage.read_by.through
+
+    watermarks = {
+        (row['user_id'], row['chatmessage__chat_id']): row['last_read']
+        for row in ReadBy.objects.values('user_id', 'chatmessage__chat_id').annotate(
+            last_read=models.Max('chatmessage_id')
+        ).order_by()
+    }
+    participants = []
+    for participant in ChatParticipant.objects.iterator():
+        last_read = max(
+            filter(None, [watermarks.get((participant.user_id, participant.chat_id)), participant.last_read_message_id]),
+            default=None,
+        )
+        unread = ChatMessage.objects.filter(chat_id=participant.chat_id).exclude(sender_id=participant.user_id)
+        if last_read is not None:
+            unread = unread.filter(pk__gt=last_read)
+        participant.last_read_message_id = last_read
+        participant.unread_count = unread.count()
+        participants.append(participant)
+    ChatParticipant.objects.bulk_update(participants, ['last_read_message', 'unread_count'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('school', '0006_chat_last_message_snapshot'),
+    ]
+
+    operations = [
+        migrations.RunPython(read_by_to_watermarks, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='chatmessage',
+            name='read_by',
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2 on 2026-10-18 08:16
+
+import re
+
+import snowballstemmer
+from django.db import migrations
+
+# SQL и токенизация записаны здесь, а не взяты из school.search: миграция не должна
+# меняться вместе с кодом приложения. Поддерживает индекс school/search.py (SearchIndex).
+INDEXES = [('school_chatmessage', 'message_content'), ('school_chat', 'title')]
+BATCH_SIZE = 1000
+WORD_RE = re.compile(r'\w+')
+
+
+def stems(stemmer, text):
+    return ' '.join(stemmer.stemWords(WORD_RE.findall((text or '').lower().replace('ё', 'е'))))
+
+
+def install_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    qn = schema_editor.quote_name
+    for table, column in INDEXES:
+        if vendor == 'sqlite':
+            fts = qn(f'{table}_fts')
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE {fts} USING fts5(content, tokenize='unicode61 remove_diacritics 2')"
+            )
+            stemmer = snowballstemmer.stemmer('russian')
+            with schema_editor.connection.cursor() as cursor:
+                cursor.execute(f'SELECT id, {qn(column)} FROM {qn(table)}')
+                while rows := cursor.fetchmany(BATCH_SIZE):
+                    with schema_editor.connection.cursor() as insert:
+                        insert.executemany(
+                            f'INSERT INTO {fts}(rowid, content) VALUES (%s, %s)',
+                            [(pk, stems(stemmer, text)) for pk, text in rows],
+                        )
+        elif vendor == 'postgresql':
+            schema_editor.execute(
+                f"ALTER TABLE {qn(table)} ADD COLUMN search_vector tsvector "
+                f"GENERATED ALWAYS AS (to_tsvector('russian', coalesce({qn(column)}, ''))) STORED"
+            )
+            schema_editor.execute(f"CREATE INDEX {qn(table + '_search_idx')} ON {qn(table)} USING GIN (search_vector)")
+
+
+def uninstall_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    qn = schema_editor.quote_name
+    for table, column in INDEXES:
+        if vendor == 'sqlite':
+            schema_editor.execute(f"DROP TABLE IF EXISTS {qn(table + '_fts')}")
+        elif vendor == 'postgresql':
+            schema_editor.execute(f'ALTER TABLE {qn(table)} DROP COLUMN IF EXISTS search_vector')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('school', '0008_chat_message_keyset_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search_indexes, uninstall_search_indexes),
+    ]
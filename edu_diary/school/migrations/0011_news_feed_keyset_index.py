@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 08:34
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('school', '0010_archived_chat_message'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='news',
+            name='news_publish_date_idx',
+        ),
+        migrations.AddIndex(
+            model_name='news',
+            index=models.Index(fields=['-publish_date', '-id'], name='news_publish_date_idx'),
+        ),
+    ]
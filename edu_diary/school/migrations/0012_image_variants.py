@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-18 08:36
+
+import edu_diary.images
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('school', '0011_news_feed_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='chat',
+            name='avatar',
+            field=edu_diary.images.VariantImageField(blank=True, null=True, upload_to='media/chat_avatars/'),
+        ),
+        migrations.AlterField(
+            model_name='news',
+            name='image',
+            field=edu_diary.images.VariantImageField(blank=True, null=True, upload_to='news_images/', verbose_name='Изображение'),
+        ),
+        migrations.AlterField(
+            model_name='project',
+            name='avatar',
+            field=edu_diary.images.VariantImageField(blank=True, null=True, upload_to='project_avatars/', verbose_name='Аватар проекта'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2 on 2026-10-18 08:52
+
+from importlib import import_module
+
+import snowballstemmer
+from django.db import migrations
+
+# Почему SQL записан в миграции, а не взят из school.search, — см. 0009_chat_search_index;
+# токенизация берётся оттуда же, чтобы индексы чатов и новостей строились одинаково
+chat_search_index = import_module('school.migrations.0009_chat_search_index')
+
+TABLE = 'school_news'
+COLUMNS = ('title', 'content')
+BATCH_SIZE = chat_search_index.BATCH_SIZE
+
+
+def stems(stemmer, texts):
+    return ' '.join(chat_search_index.stems(stemmer, text) for text in texts)
+
+
+def install_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    qn = schema_editor.quote_name
+    if vendor == 'sqlite':
+        fts = qn(f'{TABLE}_fts')
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {fts} USING fts5(content, tokenize='unicode61 remove_diacritics 2')"
+        )
+        stemmer = snowballstemmer.stemmer('russian')
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(f"SELECT id, {', '.join(qn(column) for column in COLUMNS)} FROM {qn(TABLE)}")
+            while rows := cursor.fetchmany(BATCH_SIZE):
+                with schema_editor.connection.cursor() as insert:
+                    insert.executemany(
+                        f'INSERT INTO {fts}(rowid, content) VALUES (%s, %s)',
+                        [(pk, stems(stemmer, texts)) for pk, *texts in rows],
+                    )
+    elif vendor == 'postgresql':
+        text = " || ' ' || ".join(f"coalesce({qn(column)}, '')" for column in COLUMNS)
+        schema_editor.execute(
+            f"ALTER TABLE {qn(TABLE)} ADD COLUMN search_vector tsvector "
+            f"GENERATED ALWAYS AS (to_tsvector('russian', {text})) STORED"
+        )
+        schema_editor.execute(f"CREATE INDEX {qn(TABLE + '_search_idx')} ON {qn(TABLE)} USING GIN (search_vector)")
+
+
+def uninstall_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    qn = schema_editor.quote_name
+    if vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {qn(TABLE + '_fts')}")
+    elif vendor == 'postgresql':
+        schema_editor.execute(f'ALTER TABLE {qn(TABLE)} DROP COLUMN IF EXISTS search_vector')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('school', '0012_image_variants'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
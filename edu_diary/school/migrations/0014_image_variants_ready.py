@@ -0,0 +1,44 @@
+# Generated by Django 5.2 on 2026-10-18 08:50
+
+import edu_diary.images
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('school', '0013_news_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chat',
+            name='avatar_variants_ready',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='news',
+            name='image_variants_ready',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Варианты изображения готовы'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='avatar_variants_ready',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Варианты аватара готовы'),
+        ),
+        migrations.AlterField(
+            model_name='chat',
+            name='avatar',
+            field=edu_diary.images.VariantImageField(blank=True, null=True, upload_to='media/chat_avatars/', variants_field='avatar_variants_ready'),
+        ),
+        migrations.AlterField(
+            model_name='news',
+            name='image',
+            field=edu_diary.images.VariantImageField(blank=True, null=True, upload_to='news_images/', variants_field='image_variants_ready', verbose_name='Изображение'),
+        ),
+        migrations.AlterField(
+            model_name='project',
+            name='avatar',
+            field=edu_diary.images.VariantImageField(blank=True, null=True, upload_to='project_avatars/', variants_field='avatar_variants_ready', verbose_name='Аватар проекта'),
+        ),
+    ]
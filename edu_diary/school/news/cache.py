@@ -0,0 +1,36 @@
+import hashlib
+import json
+import time
+
+from django.db import transaction
+
+from ..cache import bump_version, get_version
+
+NEWS_CACHE_TAG = 'news'
+NEWS_CACHE_TIMEOUT = 60 * 10
+NEWS_LIST_PARAMS = ('pagination', 'page', 'page_size', 'before', 'after', 'category')
+
+
+def news_list_key(request):
+    """
+    Ключ закэшированной страницы ленты: версия тега news плюс параметры страницы.
+    Хост входит в ключ, потому что ссылки next/previous и image абсолютные.
+    """
+    params = [request.get_host()] + [request.query_params.get(name, '') for name in NEWS_LIST_PARAMS]
+    digest = hashlib.md5('|'.join(params).encode()).hexdigest()
+    return f'news:list:{get_version(NEWS_CACHE_TAG)}:{digest}'
+
+
+def build_entry(data):
+    """Запись кэша: данные ответа и валидаторы для условного GET."""
+    payload = json.dumps(data, sort_keys=True, default=str, ensure_ascii=False)
+    return {
+        'data': data,
+        'etag': f'"{hashlib.md5(payload.encode()).hexdigest()}"',
+        'last_modified': int(time.time()),
+    }
+
+
+def invalidate_news():
+    """Делает недоступными все закэшированные страницы ленты после коммита транзакции."""
+    transaction.on_commit(lambda: bump_version(NEWS_CACHE_TAG))
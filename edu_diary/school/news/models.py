@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 
+from edu_diary.images import VariantImageField
+
 User = get_user_model()
 
 class Category(models.Model):
@@ -22,11 +24,17 @@ class News(models.Model):
     content = models.TextField(
         verbose_name='Содержание'
     )
-    image = models.ImageField(
+    image = VariantImageField(
         upload_to='news_images/',
         blank=True,
         null=True,
-        verbose_name='Изображение'
+        verbose_name='Изображение',
+        variants_field='image_variants_ready'
+    )
+    image_variants_ready = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name='Варианты изображения готовы'
     )
     publish_date = models.DateTimeField(
         auto_now_add=True,
@@ -50,6 +58,9 @@ class News(models.Model):
         verbose_name = 'Новость'
         verbose_name_plural = 'Новости'
         ordering = ['-publish_date']
+        indexes = [
+            models.Index(fields=['-publish_date', '-id'], name='news_publish_date_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -1,6 +1,17 @@
 from rest_framework.pagination import PageNumberPagination
 
+from school.pagination import KeysetPagination
+
 class NewsPagination(PageNumberPagination):
     page_size = 6  # Количество новостей на странице
     page_size_query_param = 'page_size'
     max_page_size = 100
+
+class NewsCursorPagination(KeysetPagination):
+    """
+    Лента новостей по ключу (publish_date, id) для бесконечной прокрутки:
+    без COUNT(*) и OFFSET, стоимость страницы не растёт с размером архива.
+    """
+    ordering = ('-publish_date', '-id')
+    page_size = NewsPagination.page_size
+    max_page_size = NewsPagination.max_page_size
@@ -0,0 +1,4 @@
+from school.search import SearchIndex
+from .models import News
+
+news_index = SearchIndex(News, 'title', 'content')
@@ -2,6 +2,8 @@ from rest_framework import serializers
 from .models import Category, News
 from django.contrib.auth import get_user_model
 
+from edu_diary.images import ImageVariantsField
+
 User = get_user_model()
 
 
@@ -10,14 +12,21 @@ class CategorySerializer(serializers.ModelSerializer):
         model = Category
         fields = ['id', 'name']
 
+class NewsAuthorSerializer(serializers.ModelSerializer):
+    """Автор в ленте: только поля, которые выбираются вместе с новостью."""
+    class Meta:
+        model = User
+        fields = ['id', 'full_name']
+
 class NewsSerializer(serializers.ModelSerializer):
-    author = serializers.StringRelatedField(read_only=True)
+    author = NewsAuthorSerializer(read_only=True)
     category = serializers.PrimaryKeyRelatedField(
         queryset=Category.objects.all(),
         required=False,
         write_only=True
     )
     category_detail = CategorySerializer(source='category', read_only=True)
+    image_variants = ImageVariantsField(source='image')
 
     class Meta:
         model = News
@@ -26,6 +35,7 @@ class NewsSerializer(serializers.ModelSerializer):
             'title',
             'content',
             'image',
+            'image_variants',
             'publish_date',
             'author',
             'category',
@@ -0,0 +1,31 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from edu_diary.images import variants_ready
+from .cache import invalidate_news
+from .models import Category, News
+from .search import news_index
+
+
+@receiver([post_save, post_delete], sender=News)
+@receiver([post_save, post_delete], sender=Category)
+def news_changed(sender, **kwargs):
+    # Лента показывает и новости, и названия категорий — любое изменение сбрасывает её кэш
+    invalidate_news()
+
+
+@receiver(variants_ready, sender=News)
+def news_image_variants_ready(sender, **kwargs):
+    # Закэшированные страницы отдают image_variants = null, пока варианты готовились
+    invalidate_news()
+
+
+@receiver(post_save, sender=News)
+def index_news(sender, instance, using, update_fields=None, **kwargs):
+    if update_fields is None or {'title', 'content'} & set(update_fields):
+        news_index.update([instance], using=using)
+
+
+@receiver(post_delete, sender=News)
+def unindex_news(sender, instance, using, **kwargs):
+    news_index.remove([instance.pk], using=using)
@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import CategoryViewSet, NewsListView , NewsCreateView
+from .views import CategoryViewSet, NewsListView , NewsCreateView, NewsSearchView
 
 
 app_name = 'news'
@@ -9,5 +9,6 @@ urlpatterns = [
     path('categories/<int:pk>/', CategoryViewSet.as_view({'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'}), name='category-detail'),
     
     path('list/', NewsListView.as_view(), name='news-list'),
+    path('search/', NewsSearchView.as_view(), name='news-search'),
     path('create/', NewsCreateView.as_view(), name='news-create'),
 ]
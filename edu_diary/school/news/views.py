@@ -1,10 +1,17 @@
 from django.views.decorators.csrf import csrf_exempt  # Можно убрать, если используете CsrfExemptSessionAuthentication
+from django.core.cache import cache
+from django.db.models import Count
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from rest_framework import generics, status, viewsets, permissions
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
-from drf_spectacular.utils import extend_schema, extend_schema_view, OpenApiResponse
+from drf_spectacular.utils import extend_schema, extend_schema_view, OpenApiParameter, OpenApiResponse
+from .cache import NEWS_CACHE_TIMEOUT, build_entry, news_list_key
 from .models import News, Category
-from .pagination import NewsPagination
+from .search import news_index
+from .pagination import NewsCursorPagination, NewsPagination
 from .serializers import NewsSerializer, CategorySerializer
 from users.permissions import IsTeacher
 from users.custom_auth import CsrfExemptSessionAuthentication  # Импортируем кастомную аутентификацию
@@ -23,21 +30,127 @@ class CategoryViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated, IsTeacher]
     authentication_classes = [CsrfExemptSessionAuthentication]  # Добавляем для консистентности
 
+def get_category_param(request):
+    category = request.query_params.get('category')
+    if not category:
+        return None
+    if not category.isdigit():
+        raise ValidationError({"detail": "Параметр 'category' должен быть ID категории."})
+    return int(category)
+
 class NewsListView(generics.ListAPIView):
-    queryset = News.objects.all().order_by('-publish_date')
+    # Автор и категория приходят тем же запросом, что и страница, без лишних колонок
+    queryset = News.objects.select_related('author', 'category').only(
+        'id', 'title', 'content', 'image', 'image_variants_ready', 'publish_date',
+        'author__id', 'author__full_name', 'category__id', 'category__name',
+    ).order_by('-publish_date', '-id')
     serializer_class = NewsSerializer
     permission_classes = [AllowAny]
     pagination_class = NewsPagination
     authentication_classes = [CsrfExemptSessionAuthentication]  # Добавляем для консистентности
 
+    @property
+    def paginator(self):
+        # ?pagination=cursor включает курсоры вместо номеров страниц; ссылки next/previous его сохраняют
+        if not hasattr(self, '_paginator'):
+            if self.request.query_params.get('pagination') == 'cursor':
+                self._paginator = NewsCursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        category = get_category_param(self.request)
+        if category is not None:
+            queryset = queryset.filter(category_id=category)
+        return queryset
+
     @extend_schema(
         tags=["Новости"],
         summary="Список всех новостей",
-        description="Возвращает список всех опубликованных новостей.",
+        description=(
+            "Возвращает список всех опубликованных новостей. Страницы кэшируются до изменения "
+            "новостей или категорий; ответ содержит ETag и Last-Modified, и повторный запрос "
+            "с If-None-Match или If-Modified-Since получает 304 без обращения к базе."
+        ),
+        parameters=[
+            OpenApiParameter('category', int, description="ID категории для фильтрации"),
+            OpenApiParameter(
+                'pagination', str, enum=['cursor'],
+                description="cursor — курсоры before/after без общего количества вместо номеров страниц",
+            ),
+            OpenApiParameter('before', str, description="Курсор (в режиме cursor): новости старше указанной"),
+            OpenApiParameter('after', str, description="Курсор (в режиме cursor): новости новее указанной"),
+        ],
+        responses={200: NewsSerializer(many=True), 304: OpenApiResponse(description="Страница не изменилась")},
+    )
+    def get(self, request, *args, **kwargs):
+        key = news_list_key(request)
+        entry = cache.get(key)
+        if entry is None:
+            entry = build_entry(self.list(request, *args, **kwargs).data)
+            cache.set(key, entry, NEWS_CACHE_TIMEOUT)
+
+        response = get_conditional_response(
+            request, etag=entry['etag'], last_modified=entry['last_modified']
+        ) or Response(entry['data'])
+        response['ETag'] = entry['etag']
+        response['Last-Modified'] = http_date(entry['last_modified'])
+        # Браузер хранит копию, но каждый раз сверяет её с сервером
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+class NewsSearchView(generics.ListAPIView):
+    queryset = NewsListView.queryset
+    serializer_class = NewsSerializer
+    permission_classes = [AllowAny]
+    pagination_class = NewsPagination
+    authentication_classes = [CsrfExemptSessionAuthentication]
+
+    @extend_schema(
+        tags=["Новости"],
+        summary="Поиск новостей",
+        description=(
+            "Полнотекстовый поиск по заголовку и тексту новостей, результаты упорядочены "
+            "по релевантности. facets — число найденных новостей в каждой категории "
+            "(без учёта фильтра category)."
+        ),
+        parameters=[
+            OpenApiParameter('q', str, required=True, description="Поисковый запрос"),
+            OpenApiParameter('category', int, description="ID категории для фильтрации"),
+        ],
     )
     def get(self, request, *args, **kwargs):
         return super().get(request, *args, **kwargs)
 
+    def list(self, request, *args, **kwargs):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({"detail": "Параметр 'q' обязателен."}, status=status.HTTP_400_BAD_REQUEST)
+
+        matches = news_index.search(self.get_queryset(), query)
+        category = get_category_param(request)
+        results = matches if category is None else matches.filter(category_id=category)
+
+        page = self.paginate_queryset(results)
+        response = self.get_paginated_response(self.get_serializer(page, many=True).data)
+        response.data['facets'] = self.get_facets(matches)
+        return response
+
+    def get_facets(self, matches):
+        """Найденные новости по категориям — один запрос с GROUP BY."""
+        facets = (
+            matches.order_by()
+            .values('category_id', 'category__name')
+            .annotate(count=Count('pk'))
+            .order_by('-count', 'category__name')
+        )
+        return [
+            {'id': facet['category_id'], 'name': facet['category__name'], 'count': facet['count']}
+            for facet in facets
+        ]
+
 class NewsCreateView(generics.GenericAPIView):
     serializer_class = NewsSerializer
     permission_classes = [IsAuthenticated, IsTeacher]
@@ -0,0 +1,161 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def _reject_constant(name):
+    raise ValueError(f'Недопустимое значение в курсоре: {name}')
+
+
+class KeysetPagination(BasePagination):
+    """
+    Постраничная выдача по ключу (keyset): страница — один диапазонный запрос
+    по индексу, сколько бы страниц назад ни ушёл пользователь.
+
+    ordering — поля ключа по убыванию, последнее должно быть уникальным (обычно id).
+    Курсор before ведёт к более старым записям, after — к более новым; курсоры
+    непрозрачны для клиента и берутся из ссылок next/previous ответа.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    before_query_param = 'before'
+    after_query_param = 'after'
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.fields = [field.lstrip('-') for field in self.ordering]
+        page_size = self.get_page_size(request)
+        direction, position = self.get_position(queryset, request)
+
+        rows = self.fetch(queryset, direction, position, page_size + 1)
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if direction == 'after':
+            # Новые записи выбираются по возрастанию, а отдаются в общем порядке — сначала новые
+            rows.reverse()
+
+        self.has_older = bool(rows) and (direction == 'after' or has_more)
+        self.has_newer = bool(rows) and (has_more if direction == 'after' else position is not None)
+        self.first_key = self.key_for(rows[0]) if rows else None
+        self.last_key = self.key_for(rows[-1]) if rows else None
+        return rows
+
+    def fetch(self, queryset, direction, position, limit):
+        """До limit строк от позиции: для after — по возрастанию ключа, иначе по убыванию."""
+        if direction == 'after':
+            queryset = queryset.filter(self.keyset_filter(position, newer=True))
+            queryset = queryset.order_by(*self.fields)
+        else:
+            if position is not None:
+                queryset = queryset.filter(self.keyset_filter(position, newer=False))
+            queryset = queryset.order_by(*self.ordering)
+        return list(queryset[:limit])
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def get_position(self, queryset, request):
+        """Направление ('before' или 'after') и значения ключа, от которых начинается страница."""
+        after = request.query_params.get(self.after_query_param)
+        if after:
+            return 'after', self.decode_cursor(queryset, after)
+        before = request.query_params.get(self.before_query_param)
+        if before:
+            return 'before', self.decode_cursor(queryset, before)
+        return 'before', None
+
+    def keyset_filter(self, position, newer):
+        """
+        Условие «ключ строки больше (меньше) position» в виде, пригодном для индекса:
+        граница по первому полю плюс лексикографическое сравнение остальных.
+        """
+        op = 'gt' if newer else 'lt'
+        condition = Q(**{f'{self.fields[-1]}__{op}': position[-1]})
+        for field, value in zip(reversed(self.fields[:-1]), reversed(position[:-1])):
+            condition = Q(**{f'{field}__{op}': value}) | (Q(**{field: value}) & condition)
+        return Q(**{f'{self.fields[0]}__{op}e': position[0]}) & condition
+
+    def key_for(self, obj):
+        return [getattr(obj, field) for field in self.fields]
+
+    def encode_cursor(self, key):
+        payload = json.dumps([value.isoformat() if hasattr(value, 'isoformat') else value for value in key])
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, queryset, cursor):
+        try:
+            # NaN и Infinity не бывают значениями ключа; 1e400 всё равно даст бесконечность
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()), parse_constant=_reject_constant)
+            if not isinstance(values, list) or len(values) != len(self.fields):
+                raise ValueError
+            if not all(isinstance(value, (str, int, float)) and not isinstance(value, bool) for value in values):
+                raise ValueError
+            opts = queryset.model._meta
+            position = [opts.get_field(field).to_python(value) for field, value in zip(self.fields, values)]
+            # Поля ключа не допускают NULL: сравнение с None в keyset_filter невозможно
+            if any(value is None for value in position):
+                raise ValueError
+            return position
+        except (TypeError, ValueError, OverflowError, DjangoValidationError) as exc:
+            raise ValidationError({"detail": self.invalid_cursor_message}) from exc
+
+    def build_link(self, param, key):
+        url = self.request.build_absolute_uri()
+        for name in self.get_position_query_params():
+            url = remove_query_param(url, name)
+        return replace_query_param(url, param, self.encode_cursor(key))
+
+    def get_position_query_params(self):
+        """Параметры, задающие начальную позицию; в ссылках на соседние страницы их заменяет курсор."""
+        return [self.before_query_param, self.after_query_param]
+
+    def get_next_link(self):
+        if not self.has_older:
+            return None
+        return self.build_link(self.before_query_param, self.last_key)
+
+    def get_previous_link(self):
+        if not self.has_newer:
+            return None
+        return self.build_link(self.after_query_param, self.first_key)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {'name': self.before_query_param, 'required': False, 'in': 'query',
+             'description': 'Курсор: записи старше указанной', 'schema': {'type': 'string'}},
+            {'name': self.after_query_param, 'required': False, 'in': 'query',
+             'description': 'Курсор: записи новее указанной', 'schema': {'type': 'string'}},
+            {'name': self.page_size_query_param, 'required': False, 'in': 'query',
+             'description': 'Количество записей на странице', 'schema': {'type': 'integer'}},
+        ]
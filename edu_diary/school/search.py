@@ -0,0 +1,133 @@
+import re
+from functools import lru_cache
+
+import snowballstemmer
+from django.db import connections
+from django.db.models import Q
+
+WORD_RE = re.compile(r'\w+')
+
+_stemmer = snowballstemmer.stemmer('russian')
+
+
+def tokenize(text):
+    return WORD_RE.findall((text or '').lower().replace('ё', 'е'))
+
+
+@lru_cache(maxsize=100_000)
+def _stem(word):
+    return _stemmer.stemWord(word)
+
+
+def stem_words(text):
+    """Основы слов по алгоритму Snowball — тому же, что у конфигурации russian в PostgreSQL."""
+    return [_stem(word) for word in tokenize(text)]
+
+
+class SearchIndex:
+    """
+    Полнотекстовый индекс по текстовым полям модели (несколько полей индексируются
+    как один текст).
+
+    SQLite: виртуальная таблица FTS5 <таблица>_fts с основами слов (rowid = pk),
+    её поддерживают сигналы через update() и remove(). PostgreSQL: вычисляемая
+    колонка tsvector с конфигурацией russian и GIN-индекс — база обновляет их сама.
+    Таблицу и колонку создают миграции (school/migrations/0009, 0013).
+    Для других баз поиск сводится к icontains по каждому слову.
+    """
+    config = 'russian'
+    vector_column = 'search_vector'
+    batch_size = 1000
+
+    def __init__(self, model, *fields):
+        self.model = model
+        self.fields = fields
+
+    @property
+    def fts_table(self):
+        return f'{self.model._meta.db_table}_fts'
+
+    def _vendor(self, using):
+        return connections[using].vendor
+
+    def rebuild(self, using='default'):
+        if self._vendor(using) != 'sqlite':
+            return
+        connection = connections[using]
+        table = connection.ops.quote_name(self.fts_table)
+        rows = self.model._base_manager.using(using).values_list('pk', *self.fields).iterator(chunk_size=self.batch_size)
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {table}')
+            batch = []
+            for pk, *texts in rows:
+                batch.append((pk, self._stems(texts)))
+                if len(batch) == self.batch_size:
+                    cursor.executemany(f'INSERT INTO {table}(rowid, content) VALUES (%s, %s)', batch)
+                    batch = []
+            if batch:
+                cursor.executemany(f'INSERT INTO {table}(rowid, content) VALUES (%s, %s)', batch)
+
+    def update(self, instances, using='default'):
+        """Переиндексирует сохранённые объекты (для SQLite; в PostgreSQL колонка вычисляется сама)."""
+        if self._vendor(using) != 'sqlite':
+            return
+        rows = [
+            (instance.pk, self._stems(getattr(instance, field) for field in self.fields))
+            for instance in instances
+        ]
+        self._delete([pk for pk, _ in rows], using)
+        table = connections[using].ops.quote_name(self.fts_table)
+        with connections[using].cursor() as cursor:
+            cursor.executemany(f'INSERT INTO {table}(rowid, content) VALUES (%s, %s)', rows)
+
+    def _stems(self, texts):
+        return ' '.join(stem for text in texts for stem in stem_words(text))
+
+    def remove(self, pks, using='default'):
+        if self._vendor(using) == 'sqlite':
+            self._delete(pks, using)
+
+    def _delete(self, pks, using):
+        table = connections[using].ops.quote_name(self.fts_table)
+        with connections[using].cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {table} WHERE rowid = %s', [(pk,) for pk in pks])
+
+    def search(self, queryset, query):
+        """
+        Отбирает из queryset строки, содержащие все слова запроса (слово может быть
+        началом более длинного), и сортирует их по релевантности — поле rank.
+        Слова могут находиться в разных полях индекса.
+        """
+        words = tokenize(query)
+        if not words:
+            return queryset.none()
+        connection = connections[queryset.db]
+        qn = connection.ops.quote_name
+        table = qn(self.model._meta.db_table)
+
+        if connection.vendor == 'sqlite':
+            fts = qn(self.fts_table)
+            match = ' '.join(f'"{stem}"*' for stem in stem_words(query))
+            queryset = queryset.extra(
+                tables=[self.fts_table],
+                where=[f'{fts}.rowid = {table}.{qn(self.model._meta.pk.column)}', f'{fts} MATCH %s'],
+                params=[match],
+                select={'rank': f'-bm25({fts})'},
+            )
+        elif connection.vendor == 'postgresql':
+            vector = f'{table}.{qn(self.vector_column)}'
+            tsquery = ' & '.join(f'{word}:*' for word in words)
+            queryset = queryset.extra(
+                where=[f"{vector} @@ to_tsquery('{self.config}', %s)"],
+                params=[tsquery],
+                select={'rank': f"ts_rank({vector}, to_tsquery('{self.config}', %s))"},
+                select_params=[tsquery],
+            )
+        else:
+            for word in words:
+                condition = Q()
+                for field in self.fields:
+                    condition |= Q(**{f'{field}__icontains': word})
+                queryset = queryset.filter(condition)
+            queryset = queryset.extra(select={'rank': '0'})
+        return queryset.order_by('-rank', '-pk')
@@ -0,0 +1,26 @@
+from rest_framework import serializers
+
+
+class PrimaryKeyListField(serializers.ListField):
+    """
+    Список первичных ключей, которые загружаются одним запросом.
+
+    PrimaryKeyRelatedField(many=True) проверяет каждый ключ отдельным запросом;
+    здесь повторы отбрасываются, а порядок первых вхождений сохраняется.
+    """
+    child = serializers.IntegerField()
+    default_error_messages = {
+        'does_not_exist': 'Недопустимый первичный ключ "{pk_value}" - объект не существует.',
+    }
+
+    def __init__(self, queryset, **kwargs):
+        self.queryset = queryset
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        pks = list(dict.fromkeys(super().to_internal_value(data)))
+        objects = self.queryset.in_bulk(pks)
+        for pk in pks:
+            if pk not in objects:
+                self.fail('does_not_exist', pk_value=pk)
+        return [objects[pk] for pk in pks]
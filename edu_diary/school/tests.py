@@ -1,3 +1,1482 @@
-from django.test import TestCase
+import base64
+import json
+from datetime import date, time, timedelta
+import threading
+from io import BytesIO, StringIO
+import posixpath
+import shutil
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from channels.auth import AuthMiddlewareStack
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.exceptions import ValidationError
+from django.db import connection, connections
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+
+from edu_diary.images import VARIANT_FORMATS, VARIANT_SIZES, variant_name
+from users.models import User, Profile
+from .diary.models import Class, Subject, Schedule, Grade, GradeAggregate
+from .chat.models import Chat, ChatMessage, ChatParticipant, ArchivedChatMessage
+from .chat.routing import websocket_urlpatterns
+from .chat.search import message_index
+from .diary.conflicts import find_overlaps
+from .diary.schedule import fetch_week_lessons, fetch_week_grades, build_skeleton, overlay_grades, get_class_skeleton
+from .news.models import Category, News
+from .news.search import news_index
+
+
+def make_user(name, role, full_name=None):
+    """Пользователь name@example.com с паролем pass123; имя по умолчанию — name с заглавной буквы."""
+    return User.objects.create_user(
+        email=f'{name}@example.com', username=name, password='pass123',
+        full_name=full_name or name.capitalize(), role=role
+    )
+
+
+def run_in_parallel(fn, n):
+    """
+    Вызывает fn(0), …, fn(n - 1) в n потоках, стартующих одновременно, и возвращает
+    (результаты по порядку, repr исключений). Соединение с базой у каждого потока своё.
+    """
+    results, errors = [None] * n, []
+    barrier = threading.Barrier(n)
+
+    def run(index):
+        try:
+            barrier.wait()
+            results[index] = fn(index)
+        except Exception as exc:
+            errors.append(repr(exc))
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+class ScheduleAssemblyTests(TestCase):
+    week_start = date(2025, 3, 3)  # понедельник
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = make_user('teacher', 'teacher')
+        cls.student = make_user('student', 'student')
+        cls.classroom = Class.objects.create(number=7, letter='Б', teacher=cls.teacher, academic_year='2024-2025')
+        Profile.objects.create(user=cls.student, classroom=cls.classroom)
+
+    def setUp(self):
+        cache.clear()
+
+    def create_lessons(self, per_day):
+        for day in range(1, 6):
+            for n in range(per_day):
+                subject = Subject.objects.create(name=f'Предмет {day}-{n}', teacher=self.teacher)
+                Schedule.objects.create(
+                    classroom=self.classroom, subject=subject, day_of_week=day,
+                    start_time=time(8 + n), end_time=time(8 + n, 45)
+                )
+                Grade.objects.create(
+                    student=self.student, subject=subject, value=5,
+                    date=self.week_start.replace(day=self.week_start.day + day - 1)
+                )
+
+    def assemble(self):
+        lessons = fetch_week_lessons(Schedule.objects.filter(classroom=self.classroom))
+        grades = fetch_week_grades(self.student, self.week_start, self.week_start.replace(day=9))
+        return overlay_grades(build_skeleton(lessons, self.week_start), self.week_start, grades)
+
+    def test_week_costs_constant_number_of_queries(self):
+        for per_day in (1, 6):
+            with self.subTest(per_day=per_day):
+                Schedule.objects.all().delete()
+                self.create_lessons(per_day)
+                with self.assertNumQueries(2):
+                    week = self.assemble()
+                self.assertEqual(len(week), 7)
+                self.assertEqual(sum(len(day['lessons']) for day in week), per_day * 5)
+
+    def test_grades_are_attached_to_lessons(self):
+        self.create_lessons(1)
+        week = self.assemble()
+        self.assertEqual(week[0]['day'], 'Пн')
+        self.assertEqual(week[0]['lessons'][0]['grade'], 5)
+        self.assertEqual(week[5]['lessons'], [])
+
+    def test_schedule_view_query_count_does_not_grow_with_lessons(self):
+        self.client.force_login(self.student)
+        for per_day in (1, 6):
+            with self.subTest(per_day=per_day):
+                Schedule.objects.all().delete()
+                self.create_lessons(per_day)
+                # сессия, пользователь, профиль, уроки, оценки
+                with self.assertNumQueries(5):
+                    response = self.client.get('/api/school/diary/schedule/', {'start_date': '2025-03-03'})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data['schedule'][0]['lessons']), per_day)
+
+    def test_schedule_view_serves_class_timetable_from_cache(self):
+        self.create_lessons(2)
+        self.client.force_login(self.student)
+        url = '/api/school/diary/schedule/'
+        first = self.client.get(url, {'start_date': '2025-03-03'})
+        # сессия, пользователь, профиль, оценки — уроки берутся из кэша
+        with self.assertNumQueries(4):
+            second = self.client.get(url, {'start_date': '2025-03-03'})
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(second.data['schedule'][0]['lessons'][0]['grade'], 5)
+
+        Grade.objects.filter(student=self.student).update(value=3)
+        response = self.client.get(url, {'start_date': '2025-03-03'})
+        self.assertEqual(response.data['schedule'][0]['lessons'][0]['grade'], 3)
+
+    def test_schedule_change_invalidates_cached_timetable(self):
+        self.create_lessons(1)
+        self.client.force_login(self.student)
+        url = '/api/school/diary/schedule/'
+        self.client.get(url, {'start_date': '2025-03-03'})
+
+        lesson = Schedule.objects.get(day_of_week=1)
+        lesson.subject.name = 'Геометрия'
+        lesson.subject.save()
+        response = self.client.get(url, {'start_date': '2025-03-03'})
+        self.assertEqual(response.data['schedule'][0]['lessons'][0]['subject'], 'Геометрия')
+
+        lesson.delete()
+        response = self.client.get(url, {'start_date': '2025-03-03'})
+        self.assertEqual(response.data['schedule'][0]['lessons'], [])
+
+    def test_moving_lesson_invalidates_both_classes(self):
+        self.create_lessons(1)
+        other = Class.objects.create(number=8, letter='А', teacher=self.teacher, academic_year='2024-2025')
+        self.client.force_login(self.student)
+        url = '/api/school/diary/schedule/'
+        self.client.get(url, {'start_date': '2025-03-03'})
+        get_class_skeleton(other.id, self.week_start, Schedule.objects.filter(classroom=other))
+
+        lesson = Schedule.objects.get(day_of_week=1)
+        lesson.classroom = other
+        lesson.save()
+        response = self.client.get(url, {'start_date': '2025-03-03'})
+        self.assertEqual(response.data['schedule'][0]['lessons'], [])
+        skeleton = get_class_skeleton(other.id, self.week_start, Schedule.objects.filter(classroom=other))
+        self.assertEqual(len(skeleton[0]['lessons']), 1)
+
+
+class ScheduleConflictTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        teacher = make_user('teacher', 'teacher')
+        cls.classroom = Class.objects.create(number=7, letter='Б', teacher=teacher, academic_year='2024-2025')
+        cls.subject = Subject.objects.create(name='Алгебра', teacher=teacher)
+        cls.lesson = Schedule.objects.create(
+            classroom=cls.classroom, subject=cls.subject, day_of_week=1,
+            start_time=time(8), end_time=time(8, 45)
+        )
+
+    def make_lesson(self, start, end, day=1):
+        return Schedule(
+            classroom=self.classroom, subject=self.subject, day_of_week=day,
+            start_time=start, end_time=end
+        )
+
+    def test_find_overlaps_sweeps_each_day_separately(self):
+        a = self.make_lesson(time(8), time(10))
+        b = self.make_lesson(time(8, 30), time(9))
+        c = self.make_lesson(time(9, 30), time(9, 45))
+        d = self.make_lesson(time(10), time(10, 45))
+        other_day = self.make_lesson(time(8), time(10), day=2)
+        self.assertEqual(find_overlaps([d, c, other_day, b, a]), [(a, b), (a, c)])
+
+    def test_clean_rejects_overlapping_lesson(self):
+        with self.assertRaises(ValidationError):
+            self.make_lesson(time(8, 30), time(9, 15)).full_clean()
+
+    def test_clean_accepts_adjacent_lesson(self):
+        self.make_lesson(time(8, 45), time(9, 30)).full_clean()
+        self.lesson.full_clean()
+
+
+class GradeBulkCreateTests(TestCase):
+    url = '/api/school/diary/grades/bulk/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = make_user('teacher', 'teacher')
+        cls.subject = Subject.objects.create(name='Алгебра', teacher=cls.teacher)
+        cls.students = User.objects.bulk_create([
+            User(email=f'student{n}@example.com', username=f'student{n}', full_name=f'Student {n}', role='student')
+            for n in range(30)
+        ])
+
+    def setUp(self):
+        self.client.force_login(self.teacher)
+
+    def post(self, grades, subject=None):
+        return self.client.post(self.url, {
+            'subject': (subject or self.subject).id,
+            'date': '2025-03-03',
+            'grades': grades,
+        }, content_type='application/json')
+
+    def test_upserts_whole_class_in_constant_queries(self):
+        Grade.objects.create(student=self.students[0], subject=self.subject, value=2, date=date(2025, 3, 3))
+        grades = [{'student': student.id, 'value': 5} for student in self.students]
+        # сессия, пользователь, предмет, ученики, существующие оценки, upsert оценок,
+        # чтение и upsert сводок, точки сохранения транзакций
+        with self.assertNumQueries(12):
+            response = self.post(grades)
+        self.assertEqual(response.status_code, 200)
+        statuses = [row['status'] for row in response.data['results']]
+        self.assertEqual(statuses, ['updated'] + ['created'] * 29)
+        self.assertEqual(Grade.objects.filter(subject=self.subject, value=5).count(), 30)
+
+    def test_reports_invalid_rows_and_saves_the_rest(self):
+        response = self.post([
+            {'student': self.students[0].id, 'value': 4},
+            {'student': self.students[1].id, 'value': 7},
+            {'student': self.teacher.id, 'value': 5},
+            {'student': self.students[0].id, 'value': 3},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [row['status'] for row in response.data['results']],
+            ['created', 'error', 'error', 'error']
+        )
+        self.assertEqual(list(Grade.objects.values_list('value', flat=True)), [4])
+
+    def test_rejects_subject_of_another_teacher(self):
+        other = make_user('other', 'teacher')
+        subject = Subject.objects.create(name='Физика', teacher=other)
+        response = self.post([{'student': self.students[0].id, 'value': 5}], subject=subject)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Grade.objects.exists())
+
+
+class GradeAggregateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = make_user('teacher', 'teacher')
+        cls.student = make_user('student', 'student')
+        cls.subject = Subject.objects.create(name='Алгебра', teacher=cls.teacher)
+
+    def aggregate(self):
+        return GradeAggregate.objects.get(student=self.student, subject=self.subject)
+
+    def test_aggregate_follows_create_update_and_delete(self):
+        first = Grade.objects.create(student=self.student, subject=self.subject, value=5, date=date(2025, 3, 3))
+        last = Grade.objects.create(student=self.student, subject=self.subject, value=3, date=date(2025, 3, 5))
+        aggregate = self.aggregate()
+        self.assertEqual((aggregate.count, aggregate.average, aggregate.last_date), (2, 4.0, date(2025, 3, 5)))
+
+        last = Grade.objects.get(pk=last.pk)
+        last.value = 4
+        last.save()
+        self.assertEqual(self.aggregate().distribution, {'2': 0, '3': 0, '4': 1, '5': 1})
+
+        last.delete()
+        aggregate = self.aggregate()
+        self.assertEqual((aggregate.count, aggregate.total, aggregate.last_date), (1, 5, date(2025, 3, 3)))
+
+        first.delete()
+        self.assertEqual(self.aggregate().count, 0)
+
+    def test_cascade_delete_of_subject_and_student(self):
+        other = Subject.objects.create(name='Геометрия', teacher=self.teacher)
+        Grade.objects.create(student=self.student, subject=self.subject, value=5, date=date(2025, 3, 3))
+        Grade.objects.create(student=self.student, subject=other, value=4, date=date(2025, 3, 3))
+
+        # Оценки удаляются каскадом после сводки: их сигналы не должны создавать сводку заново
+        self.subject.delete()
+        self.assertFalse(GradeAggregate.objects.filter(subject_id=self.subject.id).exists())
+        self.assertEqual(GradeAggregate.objects.get(subject=other).count, 1)
+
+        self.student.delete()
+        self.assertFalse(GradeAggregate.objects.exists())
+
+    def test_bulk_grading_updates_aggregates(self):
+        Grade.objects.create(student=self.student, subject=self.subject, value=2, date=date(2025, 3, 3))
+        self.client.force_login(self.teacher)
+        self.client.post('/api/school/diary/grades/bulk/', {
+            'subject': self.subject.id,
+            'date': '2025-03-03',
+            'grades': [{'student': self.student.id, 'value': 5}],
+        }, content_type='application/json')
+        self.client.post('/api/school/diary/grades/bulk/', {
+            'subject': self.subject.id,
+            'date': '2025-03-04',
+            'grades': [{'student': self.student.id, 'value': 4}],
+        }, content_type='application/json')
+        aggregate = self.aggregate()
+        self.assertEqual((aggregate.count, aggregate.total, aggregate.count_2), (2, 9, 0))
+
+    def test_summary_endpoint_reads_aggregates_only(self):
+        Grade.objects.create(student=self.student, subject=self.subject, value=5, date=date(2025, 3, 3))
+        Grade.objects.create(student=self.student, subject=self.subject, value=4, date=date(2025, 3, 4))
+        self.client.force_login(self.student)
+        # сессия, пользователь, сводки
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/school/diary/grades/summary/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['subject'], 'Алгебра')
+        self.assertEqual(response.data[0]['average'], 4.5)
+        self.assertEqual(response.data[0]['count'], 2)
+
+    def test_teacher_summary_is_limited_to_own_subjects(self):
+        colleague = make_user('colleague', 'teacher')
+        other = Subject.objects.create(name='Физика', teacher=colleague)
+        Grade.objects.create(student=self.student, subject=self.subject, value=5, date=date(2025, 3, 3))
+        Grade.objects.create(student=self.student, subject=other, value=3, date=date(2025, 3, 3))
+        self.client.force_login(self.teacher)
+        response = self.client.get('/api/school/diary/grades/summary/', {'student_id': self.student.id})
+        self.assertEqual([row['subject'] for row in response.data], ['Алгебра'])
+
+
+class GradeConcurrencyTests(TransactionTestCase):
+    """
+    Параллельная запись оценок по одной паре ученик/предмет не теряет приращений
+    и не путает статусы. SQLite с транзакциями IMMEDIATE и так выполняет записи по
+    очереди; гонки, которые закрывают приращения в UPDATE и блокировки строк, эти
+    тесты ловят на PostgreSQL (DB_ENGINE=postgres).
+    """
+
+    writers = 6
+
+    def setUp(self):
+        teacher = make_user('teacher', 'teacher')
+        self.student = make_user('student', 'student')
+        self.subject = Subject.objects.create(name='Алгебра', teacher=teacher)
+
+    def test_parallel_first_grades(self):
+        def write(n):
+            Grade.objects.create(student=self.student, subject=self.subject, value=2 + n % 4,
+                                 date=date(2025, 3, 1) + timedelta(days=n))
+
+        _, errors = run_in_parallel(write, self.writers)
+        self.assertEqual(errors, [])
+        aggregate = GradeAggregate.objects.get(student=self.student, subject=self.subject)
+        self.assertEqual(aggregate.count, self.writers)
+        self.assertEqual(aggregate.total, sum(2 + n % 4 for n in range(self.writers)))
+        self.assertEqual(aggregate.last_date, date(2025, 3, 1) + timedelta(days=self.writers - 1))
+
+    def test_parallel_bulk_grading_of_same_cells(self):
+        students = User.objects.bulk_create([
+            User(email=f'bulk{n}@example.com', username=f'bulk{n}', full_name=f'Bulk {n}', role='student')
+            for n in range(5)
+        ])
+
+        def post(n):
+            client = Client()
+            client.force_login(self.subject.teacher)
+            response = client.post('/api/school/diary/grades/bulk/', {
+                'subject': self.subject.id,
+                'date': '2025-03-03',
+                'grades': [{'student': student.id, 'value': 2 + n % 4} for student in students],
+            }, content_type='application/json')
+            return [(row['student'], row['status']) for row in response.data['results']]
+
+        results, errors = run_in_parallel(post, self.writers)
+        self.assertEqual(errors, [])
+        statuses = [status for rows in results for status in rows]
+        for student in students:
+            self.assertEqual(statuses.count((student.id, 'created')), 1)
+            self.assertEqual(statuses.count((student.id, 'updated')), self.writers - 1)
+            grade = Grade.objects.get(student=student, subject=self.subject)
+            aggregate = GradeAggregate.objects.get(student=student, subject=self.subject)
+            self.assertEqual((aggregate.count, aggregate.total), (1, grade.value))
+
+
+class GradebookTests(TestCase):
+    url = '/api/school/diary/gradebook/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = make_user('teacher', 'teacher')
+        cls.classroom = Class.objects.create(number=7, letter='Б', teacher=cls.teacher, academic_year='2024-2025')
+        cls.subject = Subject.objects.create(name='Алгебра', teacher=cls.teacher)
+        cls.students = User.objects.bulk_create([
+            User(email=f'student{n}@example.com', username=f'student{n}', full_name=f'Student {n:02d}', role='student')
+            for n in range(40)
+        ])
+        Profile.objects.bulk_create([
+            Profile(user=student, classroom=cls.classroom)
+            for student in cls.students
+        ])
+        for day in range(1, 8):
+            Schedule.objects.create(
+                classroom=cls.classroom, subject=cls.subject, day_of_week=day,
+                start_time=time(8), end_time=time(8, 45)
+            )
+
+    def setUp(self):
+        self.client.force_login(self.teacher)
+
+    def test_matrix_with_row_and_column_averages(self):
+        Grade.objects.bulk_create([
+            Grade(student=self.students[0], subject=self.subject, value=5, date=date(2025, 3, 3)),
+            Grade(student=self.students[0], subject=self.subject, value=4, date=date(2025, 3, 4)),
+            Grade(student=self.students[1], subject=self.subject, value=2, date=date(2025, 3, 3)),
+        ])
+        response = self.client.get(self.url, {
+            'subject': self.subject.id, 'classroom': self.classroom.id,
+            'date_from': '2025-03-03', 'date_to': '2025-03-05',
+        })
+        self.assertEqual(response.status_code, 200)
+        data = response.data
+        self.assertEqual(data['dates'], ['2025-03-03', '2025-03-04', '2025-03-05'])
+        self.assertEqual(data['grades'][0], [5, 4, None])
+        self.assertEqual(data['row_averages'][:3], [4.5, 2.0, None])
+        self.assertEqual(data['column_averages'], [3.5, 4.0, None])
+        self.assertEqual(data['distribution'], [1, 0, 1, 1])
+        self.assertEqual(data['row_distributions'][0], [0, 0, 1, 1])
+
+    def test_csv_export(self):
+        Grade.objects.create(student=self.students[0], subject=self.subject, value=5, date=date(2025, 3, 3))
+        response = self.client.get(self.url, {
+            'subject': self.subject.id, 'classroom': self.classroom.id,
+            'date_from': '2025-03-03', 'date_to': '2025-03-04', 'output': 'csv',
+        })
+        self.assertEqual(response.status_code, 200)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'Ученик,2025-03-03,2025-03-04,Средний балл')
+        self.assertEqual(lines[1], 'Student 00,5,,5.0')
+        self.assertEqual(len(lines), 42)
+
+    def test_nonexistent_date_is_rejected(self):
+        for params in ({'date_from': '2025-02-30'}, {'date_to': '2025-13-01'}, {'date_from': 'вчера'}):
+            response = self.client.get(self.url, {'subject': self.subject.id, 'classroom': self.classroom.id, **params})
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.data['detail'], 'Некорректный формат даты. Используйте ГГГГ-ММ-ДД')
+
+    def test_40_students_200_dates_in_fixed_queries(self):
+        start = date(2025, 1, 1)
+        Grade.objects.bulk_create([
+            Grade(student=student, subject=self.subject, value=2 + (i + j) % 4, date=start + timedelta(days=j))
+            for i, student in enumerate(self.students)
+            for j in range(200)
+        ])
+        params = {
+            'subject': self.subject.id, 'classroom': self.classroom.id,
+            'date_from': '2025-01-01', 'date_to': str(start + timedelta(days=199)),
+        }
+        # сессия, пользователь, предмет, класс, ученики, дни уроков, оценки
+        with self.assertNumQueries(7):
+            response = self.client.get(self.url, params)
+        self.assertEqual(len(response.data['dates']), 200)
+        self.assertEqual(sum(response.data['distribution']), 8000)
+
+
+class QueryPlanTests(TestCase):
+    """Горячие запросы должны идти по индексу, а не полным просмотром таблицы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = make_user('teacher', 'teacher')
+        cls.classroom = Class.objects.create(number=7, letter='Б', teacher=cls.teacher, academic_year='2024-2025')
+        cls.subject = Subject.objects.create(name='Алгебра', teacher=cls.teacher)
+        cls.chat = Chat.objects.create(title='7Б')
+
+    def assertUsesIndex(self, queryset):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            plan = queryset.explain()
+            self.assertNotIn('Seq Scan', plan, plan)
+        elif connection.vendor == 'sqlite':
+            plan = queryset.explain()
+            table = queryset.model._meta.db_table
+            for line in plan.splitlines():
+                if f'SCAN {table}' in line:
+                    self.assertIn('USING', line, plan)
+            self.assertRegex(plan, r'USING (COVERING )?INDEX', plan)
+        else:
+            self.skipTest(f'EXPLAIN не проверяется для {connection.vendor}')
+        return plan
+
+    def test_grade_range_scans(self):
+        week = (date(2025, 3, 3), date(2025, 3, 9))
+        self.assertUsesIndex(Grade.objects.filter(student=self.teacher, date__range=week))
+        self.assertUsesIndex(Grade.objects.filter(subject=self.subject, date__range=week))
+
+    def test_schedule_lookups(self):
+        self.assertUsesIndex(Schedule.objects.filter(classroom=self.classroom, day_of_week=1))
+        self.assertUsesIndex(Schedule.objects.filter(subject__in=Subject.objects.filter(teacher=self.teacher)))
+
+    def test_chat_message_history(self):
+        self.assertUsesIndex(ChatMessage.objects.filter(chat=self.chat).order_by('-created_at')[:20])
+
+    def test_chat_message_keyset_page(self):
+        from .chat.pagination import ChatMessagePagination
+        paginator = ChatMessagePagination()
+        paginator.fields = ['created_at', 'id']
+        position = [timezone.now(), 10 ** 6]
+        queryset = ChatMessage.objects.filter(chat=self.chat).filter(paginator.keyset_filter(position, newer=False))
+        self.assertUsesIndex(queryset.order_by('-created_at', '-id')[:50])
+
+    def test_chat_participant_lookups(self):
+        self.assertUsesIndex(ChatParticipant.objects.filter(user=self.teacher))
+        self.assertUsesIndex(ChatParticipant.objects.filter(chat=self.chat, user=self.teacher, role='admin'))
+
+    def test_news_feed(self):
+        self.assertUsesIndex(News.objects.order_by('-publish_date')[:6])
+
+    def test_news_feed_keyset_page(self):
+        from .news.pagination import NewsCursorPagination
+        paginator = NewsCursorPagination()
+        paginator.fields = ['publish_date', 'id']
+        queryset = News.objects.filter(paginator.keyset_filter([timezone.now(), 10 ** 6], newer=False))
+        self.assertUsesIndex(queryset.order_by('-publish_date', '-id')[:6])
+
+
+class RequestLoggingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = make_user('teacher', 'teacher')
+
+    def setUp(self):
+        self.client.force_login(self.teacher)
+
+    def test_teacher_schedule_has_no_hidden_queries(self):
+        # сессия, пользователь, уроки (оценок без student_id нет)
+        with self.assertNumQueries(3):
+            self.client.get('/api/school/diary/schedule/')
+
+    def test_request_id_is_propagated_to_logs_and_response(self):
+        with self.assertLogs('school.diary.views', level='DEBUG') as logs:
+            response = self.client.get('/api/school/diary/schedule/', HTTP_X_REQUEST_ID='abc123')
+        self.assertEqual(response['X-Request-ID'], 'abc123')
+        self.assertIn(f'user={self.teacher.pk}', logs.output[0])
+
+
+class ChatListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.friend, cls.other = User.objects.bulk_create([
+            User(email=f'{name}@example.com', username=name, full_name=name, role='student')
+            for name in ('user', 'friend', 'other')
+        ])
+        chats = Chat.objects.bulk_create([Chat(title=f'Чат {n}') for n in range(100)])
+        ChatParticipant.objects.bulk_create([
+            ChatParticipant(chat=chat, user=user, unread_count=n % 3 if user == cls.user else 0)
+            for n, chat in enumerate(chats)
+            for user in ((cls.user, cls.friend, cls.other) if n % 2 else (cls.user, cls.friend))
+        ])
+        messages = ChatMessage.objects.bulk_create([
+            ChatMessage(chat=chat, sender=cls.friend, message_content=f'{chat.title}: {n}')
+            for chat in chats
+            for n in range(2)
+        ])
+        for message in messages[1::2]:
+            message.chat.set_last_message(message)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_chat_list_query_count_does_not_grow_with_chats(self):
+        # сессия, пользователь, чаты, участники
+        with self.assertNumQueries(4) as queries:
+            response = self.client.get('/api/school/chat/chats/')
+        self.assertEqual(len(response.data), 100)
+        self.assertFalse(any(ChatMessage._meta.db_table in query['sql'] for query in queries.captured_queries))
+
+        chat = next(item for item in response.data if item['title'] == 'Чат 1')
+        self.assertEqual(chat['unread_count'], 1)
+        self.assertEqual(chat['last_message']['preview'], 'Чат 1: 1')
+        self.assertEqual(chat['last_message']['sender'], self.friend.id)
+        self.assertEqual(len(chat['participants']), 3)
+
+    def test_sending_message_updates_snapshot(self):
+        chat = Chat.objects.get(title='Чат 0')
+        response = self.client.post(f'/api/school/chat/chats/{chat.id}/messages/', {
+            'message_content': 'д' * 300
+        })
+        self.assertEqual(response.status_code, 201)
+        chat.refresh_from_db()
+        self.assertEqual(chat.last_message_id, response.data['id'])
+        self.assertEqual(chat.last_message_sender_id, self.user.id)
+        self.assertEqual(chat.last_message_preview, 'д' * 100)
+
+        # Более раннее сообщение не затирает снимок
+        older = ChatMessage.objects.filter(chat=chat).exclude(pk=chat.last_message_id).first()
+        chat.set_last_message(older)
+        chat.refresh_from_db()
+        self.assertEqual(chat.last_message_id, response.data['id'])
+
+    def test_chat_list_does_not_write(self):
+        self.client.get('/api/school/chat/chats/')
+        self.assertFalse(Chat.objects.exclude(type='private').exists())
+
+    def test_created_group_chat_gets_its_type(self):
+        response = self.client.post('/api/school/chat/chats/', {
+            'title': 'Группа', 'users': [self.friend.id, self.other.id]
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Chat.objects.get(pk=response.data['id']).type, 'group')
+
+
+class ChatUnreadConcurrencyTests(TransactionTestCase):
+    """Параллельные отправители не должны терять инкременты непрочитанных."""
+
+    senders_count = 4
+    messages_per_sender = 10
+
+    def setUp(self):
+        self.chat = Chat.objects.create(title='Класс')
+        self.users = [make_user(f'user{n}', 'student', full_name=f'User {n}') for n in range(self.senders_count + 1)]
+        ChatParticipant.objects.bulk_create([ChatParticipant(chat=self.chat, user=user) for user in self.users])
+
+    def test_single_update_per_message(self):
+        self.client.force_login(self.users[0])
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(f'/api/school/chat/chats/{self.chat.id}/messages/', {'message_content': 'Привет'})
+        updates = [query['sql'] for query in queries.captured_queries
+                   if query['sql'].startswith(f'UPDATE "{ChatParticipant._meta.db_table}"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(
+            list(ChatParticipant.objects.filter(chat=self.chat).order_by('user_id').values_list('unread_count', flat=True)),
+            [0] + [1] * self.senders_count
+        )
+
+    def test_parallel_senders_do_not_lose_increments(self):
+        def send(index):
+            client = Client()
+            client.force_login(self.users[index])
+            return [
+                client.post(
+                    f'/api/school/chat/chats/{self.chat.id}/messages/', {'message_content': f'{n}'}
+                ).status_code
+                for n in range(self.messages_per_sender)
+            ]
+
+        results, errors = run_in_parallel(send, self.senders_count)
+        self.assertEqual(errors, [])
+        self.assertEqual(results, [[201] * self.messages_per_sender] * self.senders_count)
+        # Своё сообщение обнуляет счётчик отправителя, поэтому у него непрочитаны только
+        # чужие сообщения после его последнего; у остальных — все отправленные
+        senders = list(ChatMessage.objects.filter(chat=self.chat).order_by('id').values_list('sender_id', flat=True))
+        self.assertEqual(len(senders), self.senders_count * self.messages_per_sender)
+        unread = dict(ChatParticipant.objects.filter(chat=self.chat).values_list('user_id', 'unread_count'))
+        for user in self.users:
+            last_own = max((n for n, sender_id in enumerate(senders) if sender_id == user.id), default=-1)
+            self.assertEqual(unread[user.id], len(senders) - last_own - 1)
+
+
+class ChatParticipantConcurrencyTests(TransactionTestCase):
+    """Параллельное добавление одного пользователя: один запрос добавляет, остальные получают 400."""
+
+    requests_count = 4
+
+    def setUp(self):
+        self.admin, self.newcomer = [make_user(name, 'teacher', full_name=name) for name in ('admin', 'newcomer')]
+        self.chat = Chat.objects.create(title='Класс')
+        ChatParticipant.objects.create(chat=self.chat, user=self.admin, role='admin')
+
+    def test_parallel_adds_of_same_user(self):
+        def add(index):
+            client = Client()
+            client.force_login(self.admin)
+            return client.post(
+                f'/api/school/chat/chats/{self.chat.id}/participants/add/', {'users': [self.newcomer.id]}
+            ).status_code
+
+        statuses, errors = run_in_parallel(add, self.requests_count)
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted(statuses), [201] + [400] * (self.requests_count - 1))
+        self.assertEqual(self.chat.chat_participants.filter(user=self.newcomer).count(), 1)
+
+
+class ChatReadWatermarkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = User.objects.bulk_create([
+            User(email=f'reader{n}@example.com', username=f'reader{n}', full_name=f'Reader {n}', role='student')
+            for n in range(4)
+        ])
+        cls.chat = Chat.objects.create(title='Класс', type='group')
+        ChatParticipant.objects.bulk_create([ChatParticipant(chat=cls.chat, user=user) for user in cls.users])
+
+    def send(self, user, text):
+        self.client.force_login(user)
+        response = self.client.post(f'/api/school/chat/chats/{self.chat.id}/messages/', {'message_content': text})
+        self.assertEqual(response.status_code, 201)
+        return response.data['id']
+
+    def test_mark_all_read_is_constant(self):
+        sender, reader = self.users[0], self.users[1]
+        for n in range(30):
+            self.send(sender, f'Сообщение {n}')
+        last_id = self.send(sender, 'Последнее')
+
+        self.client.force_login(reader)
+        # сессия, пользователь, чат, участник, UPDATE, перечитывание отметки
+        with self.assertNumQueries(6):
+            response = self.client.post(f'/api/school/chat/chats/{self.chat.id}/read/')
+        self.assertEqual(response.status_code, 200)
+        participant = ChatParticipant.objects.get(chat=self.chat, user=reader)
+        self.assertEqual((participant.last_read_message_id, participant.unread_count), (last_id, 0))
+
+    def test_read_count_is_derived_from_watermarks(self):
+        sender = self.users[0]
+        first = self.send(sender, 'Первое')
+        second = self.send(sender, 'Второе')
+        ChatParticipant.objects.filter(chat=self.chat, user=self.users[1]).update(last_read_message_id=first)
+        ChatParticipant.objects.filter(chat=self.chat, user=self.users[2]).update(last_read_message_id=second)
+
+        self.client.force_login(self.users[3])
+        # сессия, пользователь, чат, проверка участия, сообщения и архив с отправителями, отметки
+        with self.assertNumQueries(7):
+            response = self.client.get(f'/api/school/chat/chats/{self.chat.id}/messages/')
+        read_counts = {message['id']: message['read_count'] for message in response.data['results']}
+        self.assertEqual(read_counts, {first: 2, second: 1})
+
+    def test_sender_watermark_moves_with_own_message(self):
+        message_id = self.send(self.users[0], 'Привет')
+        participant = ChatParticipant.objects.get(chat=self.chat, user=self.users[0])
+        self.assertEqual((participant.last_read_message_id, participant.unread_count), (message_id, 0))
+
+
+class ChatMessagePaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.friend = User.objects.bulk_create([
+            User(email=f'{name}@example.com', username=name, full_name=name, role='student')
+            for name in ('user', 'friend')
+        ])
+        cls.chat = Chat.objects.create(title='Переписка')
+        ChatParticipant.objects.bulk_create([ChatParticipant(chat=cls.chat, user=user) for user in (cls.user, cls.friend)])
+        start = timezone.now() - timedelta(days=1)
+        cls.messages = ChatMessage.objects.bulk_create([
+            ChatMessage(chat=cls.chat, sender=cls.friend, message_content=f'Сообщение {n}')
+            for n in range(120)
+        ])
+        # Пары сообщений с одинаковым временем проверяют разрешение равенства по id
+        for n, message in enumerate(cls.messages):
+            message.created_at = start + timedelta(minutes=n // 2)
+        ChatMessage.objects.bulk_update(cls.messages, ['created_at'])
+        cls.url = f'/api/school/chat/chats/{cls.chat.id}/messages/'
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def ids(self, response):
+        return [message['id'] for message in response.data['results']]
+
+    def test_scrolling_back_covers_history_with_constant_queries(self):
+        expected = [message.id for message in reversed(self.messages)]
+        seen = []
+        url = self.url + '?page_size=25'
+        while url:
+            # сессия, пользователь, чат, проверка участия, страница, страница архива, отметки прочтения
+            with self.assertNumQueries(7):
+                response = self.client.get(url)
+            seen += self.ids(response)
+            url = response.data['next']
+        self.assertEqual(seen, expected)
+
+    def test_previous_link_returns_newer_page(self):
+        first = self.client.get(self.url + '?page_size=10')
+        self.assertIsNone(first.data['previous'])
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(self.ids(back), self.ids(first)[-10:])
+
+    def test_since_id_returns_newer_messages(self):
+        pivot = self.messages[110]
+        response = self.client.get(self.url, {'since_id': pivot.id})
+        self.assertEqual(self.ids(response), [message.id for message in reversed(self.messages[111:])])
+        self.assertIsNone(response.data['previous'])
+
+        response = self.client.get(self.url, {'since_id': pivot.id, 'page_size': 4})
+        self.assertEqual(self.ids(response), [message.id for message in reversed(self.messages[111:115])])
+        self.assertIsNotNone(response.data['previous'])
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(self.url, {'before': 'не-курсор'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('detail', response.data)
+        response = self.client.get(self.url, {'since_id': 10 ** 6})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cursor_with_null_or_nested_values_is_rejected(self):
+        for values in (
+            [None, None], ['2020-01-01T00:00:00Z', None], [{'a': 1}, 1], [True, 1], {'a': 1, 'b': 2},
+            ['2025-01-01T00:00:00', float('inf')], ['2025-01-01T00:00:00', float('nan')],
+            '["2025-01-01T00:00:00", 1e400]',
+        ):
+            raw = values if isinstance(values, str) else json.dumps(values)
+            cursor = base64.urlsafe_b64encode(raw.encode()).decode()
+            for param in ('before', 'after'):
+                response = self.client.get(self.url, {param: cursor})
+                self.assertEqual(response.status_code, 400, (param, values))
+                self.assertIn('detail', response.data)
+
+
+class ChatRealtimeTests(TransactionTestCase):
+    """События чата приходят подписчикам по WebSocket сразу после коммита."""
+
+    def setUp(self):
+        self.sender, self.reader, self.newcomer = [
+            make_user(name, 'student', full_name=name) for name in ('sender', 'reader', 'newcomer')
+        ]
+        self.chat = Chat.objects.create(title='Класс')
+        ChatParticipant.objects.create(chat=self.chat, user=self.sender, role='admin')
+        ChatParticipant.objects.create(chat=self.chat, user=self.reader)
+
+    async def connect(self, user):
+        client = Client()
+        await sync_to_async(client.force_login)(user)
+        cookie = f'sessionid={client.cookies["sessionid"].value}'.encode()
+        communicator = WebsocketCommunicator(
+            AuthMiddlewareStack(URLRouter(websocket_urlpatterns)), '/ws/chat/', headers=[(b'cookie', cookie)]
+        )
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return client, communicator
+
+    async def test_message_read_and_join_events(self):
+        sender_client, sender_ws = await self.connect(self.sender)
+        reader_client, reader_ws = await self.connect(self.reader)
+        url = f'/api/school/chat/chats/{self.chat.id}/'
+
+        response = await sync_to_async(sender_client.post)(url + 'messages/', {'message_content': 'Привет'})
+        event = await reader_ws.receive_json_from()
+        self.assertEqual(event['type'], 'message')
+        self.assertEqual(event['message']['id'], response.data['id'])
+        self.assertEqual(event['unread_increment'], 1)
+        self.assertEqual((await sender_ws.receive_json_from())['unread_increment'], 0)
+
+        await sync_to_async(reader_client.post)(url + 'read/')
+        read = await sender_ws.receive_json_from()
+        self.assertEqual((read['type'], read['user'], read['last_read_message_id']),
+                         ('read', self.reader.id, response.data['id']))
+        self.assertEqual((await reader_ws.receive_json_from())['type'], 'read')
+        self.assertEqual(await reader_ws.receive_json_from(),
+                         {'type': 'unread', 'chat': self.chat.id, 'unread_count': 0})
+
+        _, newcomer_ws = await self.connect(self.newcomer)
+        await sync_to_async(sender_client.post)(url + 'participants/add/', {'users': [self.newcomer.id]})
+        self.assertEqual(await newcomer_ws.receive_json_from(), {'type': 'joined', 'chat': self.chat.id})
+        await sync_to_async(sender_client.post)(url + 'messages/', {'message_content': 'Добро пожаловать'})
+        self.assertEqual((await newcomer_ws.receive_json_from())['message']['message_content'], 'Добро пожаловать')
+
+        for ws in (sender_ws, reader_ws, newcomer_ws):
+            await ws.disconnect()
+
+    async def test_anonymous_connection_is_rejected(self):
+        communicator = WebsocketCommunicator(AuthMiddlewareStack(URLRouter(websocket_urlpatterns)), '/ws/chat/')
+        connected, code = await communicator.connect()
+        self.assertEqual((connected, code), (False, 4401))
+
+
+class ChatSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.friend = User.objects.bulk_create([
+            User(email=f'{name}@example.com', username=name, full_name=name, role='student')
+            for name in ('user', 'friend')
+        ])
+        cls.chat = Chat.objects.create(title='Контрольные работы')
+        cls.other_chat = Chat.objects.create(title='Футбол')
+        ChatParticipant.objects.bulk_create([
+            ChatParticipant(chat=chat, user=user)
+            for chat in (cls.chat, cls.other_chat)
+            for user in (cls.user, cls.friend)
+        ])
+        cls.texts = [
+            'Завтра контрольная по математике',
+            'Кто решил задачу по математике? Математика сложная, математику не люблю',
+            'Ёлки зелёные, забыл тетрадь',
+            'Пойдём в кино',
+        ]
+        cls.messages = [ChatMessage.objects.create(chat=cls.chat, sender=cls.friend, message_content=text)
+                        for text in cls.texts]
+        ChatMessage.objects.create(chat=cls.other_chat, sender=cls.friend, message_content='Математика после футбола')
+        cls.url = f'/api/school/chat/chats/{cls.chat.id}/messages/'
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def search(self, query):
+        response = self.client.get(self.url, {'search': query})
+        self.assertEqual(response.status_code, 200)
+        return [message['message_content'] for message in response.data['results']]
+
+    def test_russian_word_forms_match_and_are_ranked(self):
+        results = self.search('математика')
+        self.assertEqual(results, [self.texts[1], self.texts[0]])
+
+    def test_prefix_yo_and_multiple_words(self):
+        self.assertEqual(self.search('елки'), [self.texts[2]])
+        self.assertEqual(self.search('матем контр'), [self.texts[0]])
+        self.assertEqual(self.search('"; DROP TABLE'), [])
+
+    def test_index_follows_edit_and_delete(self):
+        message = self.messages[3]
+        message.message_content = 'Пойдём в театр'
+        message.save()
+        self.assertEqual(self.search('кино'), [])
+        self.assertEqual(self.search('театр'), ['Пойдём в театр'])
+        message.delete()
+        self.assertEqual(self.search('театр'), [])
+
+    def test_chat_title_search(self):
+        response = self.client.get('/api/school/chat/chats/search/', {'search': 'контрольная'})
+        self.assertEqual([chat['id'] for chat in response.data], [self.chat.id])
+
+    def test_search_in_large_chat(self):
+        words = ['урок', 'домашнее', 'задание', 'оценка', 'перемена', 'учитель', 'класс', 'журнал']
+        ChatMessage.objects.bulk_create([
+            ChatMessage(chat=self.chat, sender=self.friend,
+                        message_content=f'{words[n % 8]} {words[n * 7 % 8]} {n}')
+            for n in range(20000)
+        ])
+        message_index.rebuild()
+
+        results = self.search('математикой')
+        self.assertEqual(len(results), 2)
+
+
+class ChatParticipantBulkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = make_user('teacher', 'teacher')
+        cls.students = User.objects.bulk_create([
+            User(email=f'student{n}@example.com', username=f'student{n}', full_name=f'Student {n}', role='student')
+            for n in range(300)
+        ])
+
+    def setUp(self):
+        self.client.force_login(self.teacher)
+
+    def split_inserts(self, queries):
+        """Запросы без INSERT участников и число этих INSERT (SQLite режет bulk_create на пачки)."""
+        insert = f'INSERT INTO "{ChatParticipant._meta.db_table}"'
+        sql = [query['sql'] for query in queries.captured_queries]
+        return [query for query in sql if not query.startswith(insert)], sum(query.startswith(insert) for query in sql)
+
+    def create_chat(self, users):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/school/chat/chats/', {
+                'title': 'Параллель', 'users': [user.id for user in users]
+            })
+        self.assertEqual(response.status_code, 201)
+        return Chat.objects.get(pk=response.data['id']), self.split_inserts(queries)
+
+    def test_chat_creation_query_count_does_not_depend_on_size(self):
+        small, (small_queries, small_inserts) = self.create_chat(self.students[:35])
+        large, (large_queries, large_inserts) = self.create_chat(self.students)
+        self.assertEqual(len(small_queries), len(large_queries))
+        self.assertEqual(small_inserts, 1)
+        self.assertLessEqual(large_inserts, 3)
+        self.assertEqual(large.chat_participants.count(), 301)
+        self.assertEqual(large.chat_participants.get(user=self.teacher).role, 'admin')
+        self.assertEqual((small.type, large.type), ('group', 'group'))
+
+    def test_add_participants_in_bulk(self):
+        chat, _ = self.create_chat(self.students[:1])
+        self.assertEqual(chat.type, 'private')
+        url = f'/api/school/chat/chats/{chat.id}/participants/add/'
+        self.client.post(url, {'users': [self.students[1].id]})
+        chat.refresh_from_db()
+        self.assertEqual(chat.type, 'group')
+
+        with CaptureQueriesContext(connection) as small:
+            self.client.post(url, {'users': [user.id for user in self.students[2:37]]})
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.post(url, {'users': [user.id for user in self.students[37:]]})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(self.split_inserts(small)[0]), len(self.split_inserts(large)[0]))
+        self.assertEqual(chat.chat_participants.count(), 301)
+
+        response = self.client.post(url, {'users': [self.students[5].id]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['detail'], 'Пользователь student5 уже в чате.')
+
+
+class ChatArchiveTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.friend = User.objects.bulk_create([
+            User(email=f'{name}@example.com', username=name, full_name=name, role='student')
+            for name in ('user', 'friend')
+        ])
+        cls.chat = Chat.objects.create(title='Старый класс')
+        ChatParticipant.objects.bulk_create([ChatParticipant(chat=cls.chat, user=user) for user in (cls.user, cls.friend)])
+        start = timezone.now() - timedelta(days=800)
+        cls.messages = ChatMessage.objects.bulk_create([
+            ChatMessage(chat=cls.chat, sender=cls.friend, message_content=f'Сообщение {n}') for n in range(60)
+        ])
+        for n, message in enumerate(cls.messages):
+            message.created_at = start + timedelta(days=n * 10)
+        ChatMessage.objects.bulk_update(cls.messages, ['created_at'])
+        cls.chat.set_last_message(cls.messages[-1])
+        # Отметка прочтения на давнем сообщении не даёт его архивировать
+        ChatParticipant.objects.filter(chat=cls.chat, user=cls.user).update(last_read_message=cls.messages[3])
+        cls.url = f'/api/school/chat/chats/{cls.chat.id}/messages/'
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def archive(self):
+        out = StringIO()
+        call_command('archive_chat_messages', days=365, batch_size=7, stdout=out)
+        return out.getvalue()
+
+    def test_command_moves_old_messages_and_keeps_references(self):
+        old = [message for message in self.messages if message.created_at < timezone.now() - timedelta(days=365)]
+        output = self.archive()
+
+        archived_ids = set(ArchivedChatMessage.objects.values_list('id', flat=True))
+        self.assertEqual(archived_ids, {message.id for message in old} - {self.messages[3].id})
+        self.assertIn(f'Перенесено сообщений: {len(archived_ids)}', output)
+        self.assertFalse(ChatMessage.objects.filter(pk__in=archived_ids).exists())
+        self.assertEqual(ChatParticipant.objects.get(chat=self.chat, user=self.user).last_read_message_id,
+                         self.messages[3].id)
+        self.assertIn('Перенесено сообщений: 0', self.archive())
+
+    def test_history_reads_archive_with_same_order_and_cursors(self):
+        before = []
+        url = self.url + '?page_size=9'
+        while url:
+            response = self.client.get(url)
+            before.append(response.data)
+            url = response.data['next']
+
+        self.archive()
+        url, after = self.url + '?page_size=9', []
+        while url:
+            response = self.client.get(url)
+            after.append(response.data)
+            url = response.data['next']
+
+        self.assertEqual(after, before)
+        self.assertEqual([message['id'] for page in after for message in page['results']],
+                         [message.id for message in reversed(self.messages)])
+
+        response = self.client.get(self.url, {'since_id': self.messages[1].id, 'page_size': 3})
+        self.assertEqual([message['id'] for message in response.data['results']],
+                         [message.id for message in reversed(self.messages[2:5])])
+
+
+class ChatInboxTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.friend = User.objects.bulk_create([
+            User(email=f'{name}@example.com', username=name, full_name=name, role='student')
+            for name in ('user', 'friend')
+        ])
+        cls.chats = Chat.objects.bulk_create([Chat(title=f'Чат {n}') for n in range(30)])
+        ChatParticipant.objects.bulk_create([
+            ChatParticipant(chat=chat, user=user, unread_count=n if user == cls.user else 0)
+            for n, chat in enumerate(cls.chats)
+            for user in (cls.user, cls.friend)
+        ])
+        for n, chat in enumerate(cls.chats[:25]):
+            message = ChatMessage.objects.create(chat=chat, sender=cls.friend, message_content=f'Сообщение {n}')
+            message.created_at = timezone.now() - timedelta(hours=n)
+            chat.set_last_message(message)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_summary_is_one_query_and_cached(self):
+        # сессия, пользователь, сводка
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/school/chat/chats/inbox/', {'limit': 3})
+        self.assertEqual(response.data['total_unread'], sum(range(30)))
+        self.assertEqual([chat['id'] for chat in response.data['chats']], [chat.id for chat in self.chats[:3]])
+        self.assertEqual(response.data['chats'][1]['unread_count'], 1)
+        self.assertEqual(response.data['chats'][1]['last_message']['preview'], 'Сообщение 1')
+
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/school/chat/chats/inbox/', {'limit': 10})
+        self.assertEqual(len(response.data['chats']), 10)
+
+    def test_send_and_read_invalidate_summary(self):
+        url = '/api/school/chat/chats/inbox/'
+        self.client.get(url)
+        chat = self.chats[29]
+
+        self.client.force_login(self.friend)
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/school/chat/chats/{chat.id}/messages/', {'message_content': 'Новое'})
+
+        self.client.force_login(self.user)
+        response = self.client.get(url)
+        self.assertEqual(response.data['total_unread'], sum(range(30)) + 1)
+        self.assertEqual(response.data['chats'][0]['id'], chat.id)
+        self.assertEqual(self.client.get(url).data, response.data)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/school/chat/chats/{chat.id}/read/')
+        response = self.client.get(url)
+        self.assertEqual(response.data['total_unread'], sum(range(29)))
+
+    def test_avatar_variants_invalidate_summary(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        buffer = BytesIO()
+        Image.new('RGB', (400, 300), 'blue').save(buffer, 'PNG')
+        chat = self.chats[0]
+        with override_settings(MEDIA_ROOT=media_root, IMAGE_VARIANT_WORKERS=0):
+            with self.captureOnCommitCallbacks() as callbacks:
+                chat.avatar.save('avatar.png', ContentFile(buffer.getvalue()))
+            response = self.client.get('/api/school/chat/chats/inbox/')
+            self.assertIsNone(response.data['chats'][0]['avatar_variants'])
+
+            # Варианты готовы: сводка собирается заново, а не отдаётся из кэша
+            with self.captureOnCommitCallbacks(execute=True):
+                for callback in callbacks:
+                    callback()
+            response = self.client.get('/api/school/chat/chats/inbox/')
+        self.assertIsNotNone(response.data['chats'][0]['avatar_variants'])
+
+    def test_invalid_limit(self):
+        response = self.client.get('/api/school/chat/chats/inbox/', {'limit': 100})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('detail', response.data)
+
+
+class NewsListCacheTests(TestCase):
+    url = '/api/school/news/list/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = make_user('teacher', 'teacher')
+        cls.events, cls.sport = Category.objects.bulk_create([Category(name='События'), Category(name='Спорт')])
+        News.objects.bulk_create([
+            News(title=f'Новость {n}', content='Текст', author=cls.teacher, category=cls.events if n % 2 else cls.sport)
+            for n in range(10)
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_page_costs_two_queries(self):
+        # COUNT(*) и страница вместе с авторами и категориями
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {'page_size': 100})
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertEqual(response.data['results'][0]['author'], {'id': self.teacher.id, 'full_name': 'Teacher'})
+
+    def test_repeat_request_is_served_from_cache(self):
+        first = self.client.get(self.url, {'page': 2})
+        self.assertEqual(first.status_code, 200)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url, {'page': 2})
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertEqual(second['Last-Modified'], first['Last-Modified'])
+
+    def test_cache_key_includes_page_size_and_category(self):
+        full = self.client.get(self.url)
+        small = self.client.get(self.url, {'page_size': 2})
+        sport = self.client.get(self.url, {'category': self.sport.id})
+        self.assertEqual(full.data['count'], 10)
+        self.assertEqual(len(small.data['results']), 2)
+        self.assertEqual(sport.data['count'], 5)
+        self.assertEqual({item['category_detail']['name'] for item in sport.data['results']}, {'Спорт'})
+
+    def test_invalid_category(self):
+        response = self.client.get(self.url, {'category': 'sport'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('detail', response.data)
+
+    def test_conditional_get_returns_304_without_queries(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        last_modified = self.client.get(self.url)['Last-Modified']
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_create_view_invalidates_cache(self):
+        etag = self.client.get(self.url)['ETag']
+        self.client.force_login(self.teacher)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/school/news/create/', {
+                'title': 'Свежая новость', 'content': 'Текст', 'category': self.events.id,
+            })
+        self.assertEqual(response.status_code, 201)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 11)
+        self.assertEqual(response.data['results'][0]['title'], 'Свежая новость')
+
+    def test_category_rename_invalidates_cache(self):
+        self.client.get(self.url, {'category': self.sport.id})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sport.name = 'Физкультура'
+            self.sport.save()
+        response = self.client.get(self.url, {'category': self.sport.id})
+        self.assertEqual(response.data['results'][0]['category_detail']['name'], 'Физкультура')
+
+
+class NewsCursorPaginationTests(TestCase):
+    url = '/api/school/news/list/'
+
+    @classmethod
+    def setUpTestData(cls):
+        teacher = make_user('teacher', 'teacher')
+        cls.news = News.objects.bulk_create([
+            News(title=f'Новость {n}', content='Текст', author=teacher) for n in range(10)
+        ])
+        # Новости идут парами с одинаковой датой — порядок внутри пары задаёт id
+        now = timezone.now()
+        for n, item in enumerate(cls.news):
+            News.objects.filter(pk=item.pk).update(publish_date=now - timedelta(days=n // 2))
+
+    def setUp(self):
+        cache.clear()
+
+    def ids(self, response):
+        return [item['id'] for item in response.data['results']]
+
+    def test_walks_feed_without_count(self):
+        expected = list(News.objects.order_by('-publish_date', '-id').values_list('id', flat=True))
+        seen = []
+        # Одна выборка страницы — без COUNT(*)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {'pagination': 'cursor', 'page_size': 4})
+        self.assertNotIn('count', response.data)
+        self.assertIsNone(response.data['previous'])
+        seen += self.ids(response)
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            seen += self.ids(response)
+        self.assertEqual(seen, expected)
+
+        previous = self.client.get(response.data['previous'])
+        self.assertEqual(self.ids(previous), expected[4:8])
+
+    def test_page_mode_is_default(self):
+        response = self.client.get(self.url, {'page_size': 4})
+        self.assertEqual(response.data['count'], 10)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {'pagination': 'cursor', 'before': 'bad'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('detail', response.data)
+
+    def test_null_cursor_is_rejected(self):
+        for values in ([None, None], ['2020-01-01T00:00:00Z', None]):
+            cursor = base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+            response = self.client.get(self.url, {'pagination': 'cursor', 'before': cursor})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('detail', response.data)
+
+
+class ImageVariantsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = make_user('teacher', 'teacher')
+        cls.category = Category.objects.create(name='События')
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(MEDIA_ROOT=media_root, IMAGE_VARIANT_WORKERS=0)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        cache.clear()
+        self.client.force_login(self.teacher)
+
+    def photo(self, size=(3000, 2000)):
+        image = Image.new('RGB', size, 'red')
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera'  # Make
+        exif[0x0112] = 6  # Orientation: повернуть на 90°
+        buffer = BytesIO()
+        image.save(buffer, 'JPEG', exif=exif.tobytes())
+        return SimpleUploadedFile('IMG_0001.JPG', buffer.getvalue(), content_type='image/jpeg')
+
+    def publish(self, image):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/school/news/create/', {
+                'title': 'Фото', 'content': 'Текст', 'category': self.category.id, 'image': image,
+            })
+        self.assertEqual(response.status_code, 201)
+        return News.objects.get(pk=response.data['id'])
+
+    def test_upload_gets_hashed_name_and_variants(self):
+        news = self.publish(self.photo())
+        self.assertRegex(news.image.name, r'^news_images/[0-9a-f]{32}\.jpg$')
+
+        with default_storage.open(news.image.name) as original:
+            image = Image.open(original)
+            self.assertEqual(image.size, (2000, 3000))
+            self.assertFalse(image.getexif())
+
+        for size, side in (('thumb', 160), ('card', 640), ('full', 1600)):
+            for fmt, pil_format in (('webp', 'WEBP'), ('jpg', 'JPEG')):
+                with default_storage.open(variant_name(news.image.name, size, fmt)) as file:
+                    image = Image.open(file)
+                    self.assertEqual(image.format, pil_format)
+                    self.assertEqual(max(image.size), side)
+                    self.assertFalse(image.getexif())
+
+    def test_feed_exposes_variant_urls(self):
+        news = self.publish(self.photo(size=(800, 600)))
+        item = self.client.get('/api/school/news/list/').data['results'][0]
+        self.assertEqual(set(item['image_variants']), {'thumb', 'card', 'full'})
+        self.assertTrue(item['image_variants']['card']['webp'].endswith(variant_name(news.image.name, 'card', 'webp')))
+        # Маленькое изображение не увеличивается, только поворачивается по EXIF
+        with default_storage.open(variant_name(news.image.name, 'full', 'jpg')) as file:
+            self.assertEqual(Image.open(file).size, (600, 800))
+
+    def test_readiness_is_stored_and_urls_need_no_storage_access(self):
+        news = self.publish(self.photo(size=(400, 300)))
+        news.refresh_from_db()
+        self.assertTrue(news.image_variants_ready)
+        with mock.patch.object(type(default_storage._wrapped), 'exists', side_effect=AssertionError('stat')):
+            item = self.client.get('/api/school/news/list/').data['results'][0]
+        self.assertIsNotNone(item['image_variants'])
+
+    def test_new_file_resets_readiness(self):
+        news = self.publish(self.photo(size=(400, 300)))
+        with self.captureOnCommitCallbacks(execute=False):
+            news.image = self.photo(size=(500, 300))
+            news.save()
+        news.refresh_from_db()
+        self.assertFalse(news.image_variants_ready)
+
+    def test_variants_are_null_until_ready(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            response = self.client.post('/api/school/news/create/', {
+                'title': 'Фото', 'content': 'Текст', 'category': self.category.id, 'image': self.photo(),
+            })
+        self.assertIsNone(response.data['image_variants'])
+        self.assertIsNotNone(response.data['image'])
+        # Оригинал без EXIF уже до фоновой обработки
+        news = News.objects.get(pk=response.data['id'])
+        with default_storage.open(news.image.name) as original:
+            image = Image.open(original)
+            self.assertFalse(image.getexif())
+            self.assertEqual(image.size, (2000, 3000))
+
+    def test_same_content_gets_same_name(self):
+        first = self.publish(self.photo())
+        second = self.publish(self.photo())
+        self.assertEqual(first.image.name, second.image.name)
+        second.refresh_from_db()
+        self.assertTrue(second.image_variants_ready)
+        directory, files = default_storage.listdir(posixpath.dirname(first.image.name))
+        self.assertEqual(len(files), 1 + len(VARIANT_SIZES) * len(VARIANT_FORMATS))
+
+    def test_command_generates_missing_variants(self):
+        # Файл, загруженный до появления вариантов, под старым именем
+        name = default_storage.save('news_images/old.jpg', self.photo(size=(300, 200)))
+        News.objects.create(title='Старая', content='Текст', author=self.teacher, image=name)
+        out = StringIO()
+        call_command('generate_image_variants', stdout=out)
+        self.assertIn('Обработано изображений: 1', out.getvalue())
+        self.assertTrue(default_storage.exists('news_images/old_full.jpg'))
+        with default_storage.open(name) as original:
+            self.assertFalse(Image.open(original).getexif())
+
+        call_command('generate_image_variants', stdout=out)
+        self.assertIn('Обработано изображений: 0', out.getvalue())
+
+    @override_settings(DEBUG=True)
+    def test_variants_are_served_with_far_future_cache(self):
+        from edu_diary.images import serve_media
+        from django.conf import settings
+        news = self.publish(self.photo(size=(400, 300)))
+        request = RequestFactory().get('/media/')
+        response = serve_media(request, variant_name(news.image.name, 'thumb', 'webp'), document_root=settings.MEDIA_ROOT)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        response = serve_media(request, news.image.name, document_root=settings.MEDIA_ROOT)
+        self.assertNotIn('Cache-Control', response)
+
+
+class NewsSearchTests(TestCase):
+    url = '/api/school/news/search/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = make_user('teacher', 'teacher')
+        cls.events, cls.sport = Category.objects.bulk_create([Category(name='События'), Category(name='Спорт')])
+        cls.olympiad = News.objects.create(
+            title='Олимпиада по математике', content='Ученики седьмых классов заняли призовые места.',
+            author=cls.teacher, category=cls.events,
+        )
+        cls.football = News.objects.create(
+            title='Турнир по футболу', content='После уроков прошёл школьный турнир, победили седьмые классы.',
+            author=cls.teacher, category=cls.sport,
+        )
+        cls.concert = News.objects.create(
+            title='Концерт', content='Весенний концерт перенесён на пятницу.',
+            author=cls.teacher, category=cls.events,
+        )
+
+    def search(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def titles(self, response):
+        return [item['title'] for item in response.data['results']]
+
+    def test_searches_title_and_content(self):
+        self.assertEqual(self.titles(self.search(q='математика')), ['Олимпиада по математике'])
+        self.assertEqual(self.titles(self.search(q='концерта пятница')), ['Концерт'])
+        self.assertEqual(self.titles(self.search(q='турнир футбол')), ['Турнир по футболу'])
+
+    def test_facets_count_matches_per_category(self):
+        # сам поиск, COUNT(*) страницы и фасеты одним GROUP BY
+        with self.assertNumQueries(3):
+            response = self.search(q='седьмой класс')
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(response.data['facets'], [
+            {'id': self.events.id, 'name': 'События', 'count': 1},
+            {'id': self.sport.id, 'name': 'Спорт', 'count': 1},
+        ])
+
+    def test_category_filter_keeps_all_facets(self):
+        response = self.search(q='седьмой класс', category=self.sport.id)
+        self.assertEqual(self.titles(response), ['Турнир по футболу'])
+        self.assertEqual(len(response.data['facets']), 2)
+
+    def test_requires_query(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('detail', response.data)
+
+    def test_index_follows_edit_and_delete(self):
+        self.concert.content = 'Весенний концерт отменён.'
+        self.concert.save()
+        self.assertEqual(self.titles(self.search(q='пятница')), [])
+        self.concert.delete()
+        self.assertEqual(self.titles(self.search(q='концерт')), [])
+
+    def test_search_over_many_articles(self):
+        words = ['урок', 'каникулы', 'экзамен', 'родители', 'собрание', 'учитель', 'спортзал', 'библиотека']
+        News.objects.bulk_create([
+            News(title=f'{words[n % 8]} {n}', content=f'{words[n * 3 % 8]} {words[n * 5 % 8]} ' * 20,
+                 author=self.teacher, category=self.events if n % 3 else self.sport)
+            for n in range(20000)
+        ])
+        news_index.rebuild()
+
+        response = self.search(q='олимпиада')
+        self.assertEqual(self.titles(response), ['Олимпиада по математике'])
@@ -32,9 +32,9 @@ class UserAdmin(BaseUserAdmin):
 
 @admin.register(Profile)
 class ProfileAdmin(admin.ModelAdmin):
-    list_display = ('user', 'class_number', 'class_letter', 'phone')
+    list_display = ('user', 'classroom', 'phone')
     search_fields = ('user__email', 'user__full_name', 'phone')
-    list_filter = ('class_number',)
+    list_filter = ('classroom__academic_year', 'classroom__number')
 
 
 @admin.register(StudentParent)
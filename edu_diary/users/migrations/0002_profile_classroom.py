@@ -0,0 +1,44 @@
+# Generated by Django 5.2 on 2026-10-18 08:01
+
+from datetime import date
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_profile_classroom(apps, schema_editor):
+    Profile = apps.get_model('users', 'Profile')
+    Class = apps.get_model('school', 'Class')
+
+    today = date.today()
+    start = today.year if today.month >= 9 else today.year - 1
+    current_year = f"{start}-{start + 1}"
+
+    pairs = Profile.objects.filter(
+        class_number__isnull=False, class_letter__isnull=False
+    ).values_list('class_number', 'class_letter').distinct()
+    for number, letter in pairs:
+        classes = Class.objects.filter(number=number, letter=letter)
+        classroom = (
+            classes.filter(academic_year=current_year).first()
+            or classes.order_by('-academic_year').first()
+        )
+        if classroom:
+            Profile.objects.filter(class_number=number, class_letter=letter).update(classroom=classroom)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('school', '0004_gradeaggregate'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='classroom',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='profiles', to='school.class', verbose_name='Класс'),
+        ),
+        migrations.RunPython(backfill_profile_classroom, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-18 08:36
+
+import edu_diary.images
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_profile_classroom'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='avatar',
+            field=edu_diary.images.VariantImageField(blank=True, null=True, upload_to='avatars/', verbose_name='Аватар'),
+        ),
+    ]
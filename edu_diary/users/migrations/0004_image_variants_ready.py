@@ -0,0 +1,24 @@
+# Generated by Django 5.2 on 2026-10-18 08:50
+
+import edu_diary.images
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='avatar_variants_ready',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Варианты аватара готовы'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='avatar',
+            field=edu_diary.images.VariantImageField(blank=True, null=True, upload_to='avatars/', variants_field='avatar_variants_ready', verbose_name='Аватар'),
+        ),
+    ]
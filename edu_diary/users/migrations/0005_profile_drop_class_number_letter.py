@@ -0,0 +1,38 @@
+from django.db import migrations
+
+
+def backfill_missing_classroom(apps, schema_editor):
+    # Номер и буква больше не хранятся: профили, которым класс ещё не был назначен,
+    # в последний раз получают его по этим полям (класс последнего учебного года)
+    Profile = apps.get_model('users', 'Profile')
+    Class = apps.get_model('school', 'Class')
+
+    pairs = Profile.objects.filter(
+        classroom__isnull=True, class_number__isnull=False, class_letter__isnull=False
+    ).values_list('class_number', 'class_letter').distinct()
+    for number, letter in pairs:
+        classroom = Class.objects.filter(number=number, letter=letter).order_by('-academic_year').first()
+        if classroom:
+            Profile.objects.filter(
+                classroom__isnull=True, class_number=number, class_letter=letter
+            ).update(classroom=classroom)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('school', '0014_image_variants_ready'),
+        ('users', '0004_image_variants_ready'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_missing_classroom, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='profile',
+            name='class_number',
+        ),
+        migrations.RemoveField(
+            model_name='profile',
+            name='class_letter',
+        ),
+    ]
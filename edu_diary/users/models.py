@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 
+from edu_diary.images import VariantImageField
+
 
 class User(AbstractUser):
     ROLES = (
@@ -12,7 +14,10 @@ class User(AbstractUser):
     email = models.EmailField(unique=True, verbose_name='Email')
     full_name = models.CharField(max_length=255, verbose_name='Полное имя')
     role = models.CharField(max_length=10, choices=ROLES, verbose_name='Роль')
-    avatar = models.ImageField(upload_to='avatars/', null=True, blank=True, verbose_name='Аватар')
+    avatar = VariantImageField(
+        upload_to='avatars/', null=True, blank=True, verbose_name='Аватар', variants_field='avatar_variants_ready'
+    )
+    avatar_variants_ready = models.BooleanField(default=False, editable=False, verbose_name='Варианты аватара готовы')
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'full_name', 'role']
@@ -26,9 +31,20 @@ class User(AbstractUser):
 
 
 class Profile(models.Model):
+    """
+    Класс ученика хранится только ссылкой classroom на класс конкретного учебного года;
+    номер и буква читаются из него. При переходе на новый учебный год профили переводятся
+    в классы следующего года командой rollover_classes.
+    """
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile', verbose_name='Пользователь')
-    class_number = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name='Номер класса')
-    class_letter = models.CharField(max_length=1, null=True, blank=True, verbose_name='Буква класса')
+    classroom = models.ForeignKey(
+        'school.Class',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='profiles',
+        verbose_name='Класс'
+    )
     phone = models.CharField(max_length=15, null=True, blank=True, verbose_name='Телефон')
     address = models.TextField(null=True, blank=True, verbose_name='Адрес')
 
@@ -39,6 +55,14 @@ class Profile(models.Model):
     def __str__(self):
         return f"Профиль {self.user.full_name}"
 
+    @property
+    def class_number(self):
+        return self.classroom.number if self.classroom_id else None
+
+    @property
+    def class_letter(self):
+        return self.classroom.letter if self.classroom_id else None
+
 
 class StudentParent(models.Model):
     student = models.ForeignKey(
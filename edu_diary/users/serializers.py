@@ -1,23 +1,36 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
+
+from edu_diary.images import ImageVariantsField
+from school.diary.models import Class
 from .models import Profile, StudentParent
 
 User = get_user_model()
 
 
 class ProfileSerializer(serializers.ModelSerializer):
+    # Номер и буква берутся из класса; задаётся только сам класс
+    class_number = serializers.IntegerField(source='classroom.number', read_only=True, default=None)
+    class_letter = serializers.CharField(source='classroom.letter', read_only=True, default=None)
+
     class Meta:
         model = Profile
-        fields = ['id', 'class_number', 'class_letter', 'phone', 'address']
+        fields = ['id', 'class_number', 'class_letter', 'classroom', 'phone', 'address']
+
+    def validate_classroom(self, classroom):
+        if classroom and classroom.academic_year != Class.current_academic_year():
+            raise serializers.ValidationError('Класс должен относиться к текущему учебному году')
+        return classroom
 
 
 class UserSerializer(serializers.ModelSerializer):
     profile = ProfileSerializer(read_only=True)
+    avatar_variants = ImageVariantsField(source='avatar')
 
     class Meta:
         model = User
-        fields = ['id', 'username', 'email', 'full_name', 'role', 'avatar', 'date_joined', 'profile']
+        fields = ['id', 'username', 'email', 'full_name', 'role', 'avatar', 'avatar_variants', 'date_joined', 'profile']
         read_only_fields = ['id', 'date_joined']
 
 
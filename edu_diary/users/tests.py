@@ -1,3 +1,65 @@
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
 
-# Create your tests here.
+from school.diary.models import Class
+from .models import User, Profile
+
+
+class ProfileClassroomTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user(
+            email='teacher@example.com', username='teacher', password='pass123',
+            full_name='Teacher', role='teacher'
+        )
+        cls.student = User.objects.create_user(
+            email='student@example.com', username='student', password='pass123',
+            full_name='Student', role='student'
+        )
+        cls.old_class = Class.objects.create(number=7, letter='Б', teacher=cls.teacher, academic_year='2000-2001')
+        cls.current_class = Class.objects.create(
+            number=7, letter='Б', teacher=cls.teacher, academic_year=Class.current_academic_year()
+        )
+
+    def test_number_and_letter_are_read_from_classroom(self):
+        profile = Profile.objects.create(user=self.student, classroom=self.old_class)
+        self.assertEqual((profile.class_number, profile.class_letter), (7, 'Б'))
+        self.client.force_login(self.student)
+        response = self.client.get('/api/users/profile/')
+        self.assertEqual(response.data['profile']['class_number'], 7)
+
+    def test_profile_update_rejects_class_of_another_year(self):
+        Profile.objects.create(user=self.student)
+        self.client.force_login(self.student)
+        response = self.client.patch(
+            '/api/users/profile/update/', {'profile': {'classroom': self.old_class.pk}}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+        response = self.client.patch(
+            '/api/users/profile/update/', {'profile': {'classroom': self.current_class.pk}}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Profile.objects.get(user=self.student).classroom, self.current_class)
+
+    def test_rollover_moves_profiles_to_next_year_classes(self):
+        previous_year = Class.previous_academic_year(Class.current_academic_year())
+        seventh = Class.objects.create(number=7, letter='А', teacher=self.teacher, academic_year=previous_year)
+        eighth = Class.objects.create(number=8, letter='А', teacher=self.teacher, academic_year=Class.current_academic_year())
+        graduates = Class.objects.create(number=11, letter='А', teacher=self.teacher, academic_year=previous_year)
+        profile = Profile.objects.create(user=self.student, classroom=seventh)
+        graduate = User.objects.create_user(
+            email='graduate@example.com', username='graduate', password='pass123',
+            full_name='Graduate', role='student'
+        )
+        graduate_profile = Profile.objects.create(user=graduate, classroom=graduates)
+
+        out = StringIO()
+        call_command('rollover_classes', stdout=out)
+        profile.refresh_from_db()
+        graduate_profile.refresh_from_db()
+        self.assertEqual(profile.classroom, eighth)
+        self.assertEqual(graduate_profile.classroom, graduates)
+        self.assertIn('Переведено учеников: 1', out.getvalue())
+        self.assertIn('11А', out.getvalue())